@@ -0,0 +1,501 @@
+import math
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+    'expires REAL, accessed REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed_idx ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires_idx ON cache (expires)',
+)
+# SQLite ограничивает число параметров в одном запросе.
+MAX_PARAMS = 500
+
+
+class SQLiteCache(BaseCache):
+    """Общий для всех процессов кеш в файле SQLite.
+
+    LOCATION - путь к файлу базы. Записи сверх MAX_ENTRIES вытесняются
+    по времени последнего чтения (LRU), каждый раз освобождается
+    MAX_ENTRIES / CULL_FREQUENCY мест; CULL_FREQUENCY = 0, как и во
+    встроенных бэкендах Django, очищает кеш целиком. Запись и incr
+    выполняются в
+    транзакциях BEGIN IMMEDIATE, поэтому атомарны между процессами.
+
+    Чтение блокировку записи не берёт. Время чтения обновляется, только
+    если сохранённое старше TOUCH_INTERVAL секунд, и не сразу, а при
+    ближайшей записи этого экземпляра (или когда таких ключей
+    наберётся на один запрос). Переполнение проверяется не на каждой
+    записи, а раз в CULL_EVERY записей, поэтому MAX_ENTRIES может
+    ненадолго превышаться.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.location = location
+        self.touch_interval = float(options.get('TOUCH_INTERVAL', 60))
+        self.cull_every = int(options.get('CULL_EVERY', 100))
+        self._local = threading.local()
+        self._pending_touches = set()
+        self._writes = 0
+
+    @property
+    def connection(self):
+        # Соединение нельзя переносить через fork, поэтому оно
+        # привязано к процессу и потоку.
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self.location)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            local.connection = sqlite3.connect(
+                self.location,
+                timeout=30,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            local.connection.execute('PRAGMA journal_mode=WAL')
+            local.connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                local.connection.execute(statement)
+            local.pid = os.getpid()
+        return local.connection
+
+    @contextmanager
+    def transaction(self):
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _live_rows(self, connection, keys, now):
+        """{ключ: (значение, время чтения)} для живых записей keys."""
+        rows = {}
+        for start in range(0, len(keys), MAX_PARAMS):
+            chunk = keys[start:start + MAX_PARAMS]
+            rows.update(
+                (key, (value, accessed))
+                for key, value, accessed in connection.execute(
+                    'SELECT key, value, accessed FROM cache '
+                    'WHERE key IN ({}) '
+                    'AND (expires IS NULL OR expires > ?)'.format(
+                        ', '.join('?' * len(chunk))
+                    ),
+                    (*chunk, now)
+                )
+            )
+        return rows
+
+    def _touch_rows(self, connection, keys, now):
+        for start in range(0, len(keys), MAX_PARAMS):
+            chunk = keys[start:start + MAX_PARAMS]
+            connection.execute(
+                'UPDATE cache SET accessed = ? WHERE key IN ({})'.format(
+                    ', '.join('?' * len(chunk))
+                ),
+                (now, *chunk)
+            )
+
+    def _flush_touches(self, connection, now):
+        keys, self._pending_touches = list(self._pending_touches), set()
+        self._touch_rows(connection, keys, now)
+
+    def _cull(self, connection, now):
+        self._writes += 1
+        if self._writes % self.cull_every:
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?',
+            (now,)
+        )
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        if not self._cull_frequency:
+            connection.execute('DELETE FROM cache')
+            return
+        excess = (
+            count - self._max_entries
+            + self._max_entries // self._cull_frequency
+        )
+        connection.execute(
+            'DELETE FROM cache WHERE key IN ('
+            'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+            (excess,)
+        )
+
+    def _write(self, connection, rows, now):
+        self._flush_touches(connection, now)
+        connection.executemany(
+            'INSERT INTO cache (key, value, expires, accessed) '
+            'VALUES (?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+            'value = excluded.value, expires = excluded.expires, '
+            'accessed = excluded.accessed',
+            [(key, value, expires, now) for key, value, expires in rows]
+        )
+        self._cull(connection, now)
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        key_map = {self._key(key, version): key for key in keys}
+        if not key_map:
+            return {}
+        now = time.time()
+        rows = self._live_rows(self.connection, list(key_map), now)
+        self._pending_touches.update(
+            key for key, (_, accessed) in rows.items()
+            if accessed < now - self.touch_interval
+        )
+        if len(self._pending_touches) >= MAX_PARAMS:
+            with self.transaction() as connection:
+                self._flush_touches(connection, now)
+        return {
+            key_map[key]: pickle.loads(value)
+            for key, (value, _) in rows.items()
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout=timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = [
+            (
+                self._key(key, version),
+                pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                expires,
+            )
+            for key, value in data.items()
+        ]
+        if rows:
+            with self.transaction() as connection:
+                self._write(connection, rows, time.time())
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self.transaction() as connection:
+            if self._live_rows(connection, [key], now):
+                return False
+            self._write(connection, [(
+                key,
+                pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                self.get_backend_timeout(timeout),
+            )], now)
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self.transaction() as connection:
+            rows = self._live_rows(connection, [key], now)
+            if not rows:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(rows[key][0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ?, accessed = ? WHERE key = ?',
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), now, key)
+            )
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self.transaction() as connection:
+            return connection.execute(
+                'UPDATE cache SET expires = ?, accessed = ? WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), now, key, now)
+            ).rowcount == 1
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return bool(self._live_rows(self.connection, [key], time.time()))
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        with self.transaction() as connection:
+            for start in range(0, len(keys), MAX_PARAMS):
+                chunk = keys[start:start + MAX_PARAMS]
+                connection.execute(
+                    'DELETE FROM cache WHERE key IN ({})'.format(
+                        ', '.join('?' * len(chunk))
+                    ),
+                    chunk
+                )
+
+    def clear(self):
+        self.connection.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение живёт весь процесс: открывать файл на каждый
+        # запрос дороже, чем держать его.
+        pass
+
+
+class ProcessTier:
+    """Общее для всех потоков процесса состояние L1."""
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.next_poll = 0
+
+
+# Django создаёт свой экземпляр бэкенда в каждом потоке, поэтому L1
+# живёт на уровне модуля.
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+def process_tier(name):
+    with _tiers_lock:
+        tier = _tiers.get(name)
+        if tier is None or tier.pid != os.getpid():
+            tier = _tiers[name] = ProcessTier()
+        return tier
+
+
+class TieredCache(BaseCache):
+    """Маленький LRU-кеш процесса (L1) перед общим кешем (L2).
+
+    OPTIONS:
+    SHARED - алиас общего кеша из CACHES;
+    L1_MAX_ENTRIES - сколько записей держать в памяти процесса;
+    L1_TIMEOUT - сколько секунд запись живёт в L1 в любом случае;
+    INVALIDATION_INTERVAL - как часто процесс сверяет версии ключей
+    своего L1 с общим кешем: запись, изменённая или удалённая в другом
+    процессе, вытесняется из L1 не позже чем через этот интервал.
+
+    Каждая запись в L2 получает новую версию, и L1 помнит версию, под
+    которой взял значение. Сверка читает одним get_many версии только
+    тех ключей, что лежат в L1, поэтому запись чужих ключей, даже
+    частая, L1 не трогает.
+
+    Строки, числа и кортежи из них хранятся в L1 как есть, остальные
+    значения - сериализованными, чтобы запросы не делили изменяемые
+    объекты.
+    """
+    VERSION_KEY = 'tiered:version:{}'
+    IMMUTABLE_TYPES = (str, bytes, int, float, bool, type(None))
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.location = location or 'default'
+        self.shared_alias = options.get('SHARED', 'shared')
+        self.l1_max_entries = int(options.get('L1_MAX_ENTRIES', 1000))
+        self.l1_timeout = float(options.get('L1_TIMEOUT', 60))
+        self.invalidation_interval = float(
+            options.get('INVALIDATION_INTERVAL', 1)
+        )
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    @property
+    def tier(self):
+        return process_tier(self.location)
+
+    def _key(self, key, version):
+        return self.shared.make_key(key, version=version)
+
+    def _timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def _l1_get(self, tier, key, now):
+        with tier.lock:
+            entry = tier.entries.get(key)
+            if entry is None:
+                return False, None
+            value, pickled, expires, _ = entry
+            if expires <= now:
+                del tier.entries[key]
+                return False, None
+            tier.entries.move_to_end(key)
+        return True, pickle.loads(value) if pickled else value
+
+    def _is_immutable(self, value):
+        if isinstance(value, tuple):
+            return all(self._is_immutable(item) for item in value)
+        return isinstance(value, self.IMMUTABLE_TYPES)
+
+    def _l1_set(self, tier, key, value, timeout, now, stamp):
+        expires = now + self.l1_timeout
+        if timeout is not None:
+            expires = min(expires, now + timeout)
+        pickled = not self._is_immutable(value)
+        if pickled:
+            value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with tier.lock:
+            tier.entries[key] = (value, pickled, expires, stamp)
+            tier.entries.move_to_end(key)
+            while len(tier.entries) > self.l1_max_entries:
+                tier.entries.popitem(last=False)
+
+    def _l1_evict(self, tier, keys):
+        with tier.lock:
+            for key in keys:
+                tier.entries.pop(key, None)
+
+    def _l1_clear(self, tier):
+        with tier.lock:
+            tier.entries.clear()
+
+    def _stamps(self, keys):
+        """{ключ: версия} для ключей, у которых версия есть в L2."""
+        version_keys = {self.VERSION_KEY.format(key): key for key in keys}
+        return {
+            version_keys[version_key]: stamp
+            for version_key, stamp in self.shared.get_many(
+                list(version_keys)
+            ).items()
+        }
+
+    def _bump(self, keys, timeout):
+        """Даёт ключам новую версию, чтобы другие процессы их вытеснили."""
+        stamp = uuid.uuid4().hex
+        if keys:
+            self.shared.set_many(
+                {self.VERSION_KEY.format(key): stamp for key in keys},
+                timeout=timeout
+            )
+        return stamp
+
+    def _poll(self, tier, now):
+        if now < tier.next_poll:
+            return
+        tier.next_poll = now + self.invalidation_interval
+        with tier.lock:
+            held = {key: entry[3] for key, entry in tier.entries.items()}
+        if not held:
+            return
+        stamps = self._stamps(held)
+        with tier.lock:
+            for key, stamp in held.items():
+                entry = tier.entries.get(key)
+                # Запись могли обновить, пока шла сверка.
+                if (
+                    stamps.get(key) != stamp
+                    and entry is not None and entry[3] == stamp
+                ):
+                    del tier.entries[key]
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        tier = self.tier
+        now = time.monotonic()
+        self._poll(tier, now)
+        found, missing = {}, {}
+        for key in keys:
+            shared_key = self._key(key, version)
+            hit, value = self._l1_get(tier, shared_key, now)
+            if hit:
+                found[key] = value
+            else:
+                missing[key] = shared_key
+        if missing:
+            # Версия читается до значения: запись, которая вклинится
+            # между ними, сменит версию, и сверка вытеснит значение.
+            stamps = self._stamps(missing.values())
+            fetched = self.shared.get_many(list(missing), version=version)
+            for key, value in fetched.items():
+                if missing[key] in stamps:
+                    self._l1_set(
+                        tier, missing[key], value, None, now,
+                        stamps[missing[key]]
+                    )
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout=timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(timeout)
+        failed = self.shared.set_many(data, timeout=timeout, version=version)
+        keys = {key: self._key(key, version) for key in data}
+        stamp = self._bump(list(keys.values()), timeout)
+        tier = self.tier
+        now = time.monotonic()
+        for key, value in data.items():
+            if key not in failed:
+                self._l1_set(tier, keys[key], value, timeout, now, stamp)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(timeout)
+        added = self.shared.add(key, value, timeout=timeout, version=version)
+        if added:
+            key = self._key(key, version)
+            self._l1_set(
+                self.tier, key, value, timeout, time.monotonic(),
+                self._bump([key], timeout)
+            )
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version=version)
+        self._forget([self._key(key, version)], None)
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(
+            key, timeout=self._timeout(timeout), version=version
+        )
+
+    def has_key(self, key, version=None):
+        return self.get(key, self, version=version) is not self
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.shared.delete_many(keys, version=version)
+        # Версия удалённого ключа нужна, пока его могут держать L1.
+        self._forget(
+            [self._key(key, version) for key in keys],
+            math.ceil(self.l1_timeout)
+        )
+
+    def _forget(self, keys, timeout):
+        self._l1_evict(self.tier, keys)
+        self._bump(keys, timeout)
+
+    def clear(self):
+        # Версии очищаются вместе с L2, и сверка вытеснит L1 всех
+        # процессов.
+        self.shared.clear()
+        self._l1_clear(self.tier)
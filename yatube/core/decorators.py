@@ -0,0 +1,9 @@
+def query_budget(queries):
+    """Задаёт максимальное число SQL-запросов на один вызов view.
+
+    Бюджет проверяет core.middleware.QueryBudgetMiddleware.
+    """
+    def decorator(view):
+        view.query_budget = queries
+        return view
+    return decorator
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from core import stampede
+
+
+class Command(BaseCommand):
+    help = 'Показывает, сколько пересчётов кеша удалось избежать.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Обнулить счётчики после вывода.',
+        )
+
+    def handle(self, *args, reset, **options):
+        values = stampede.metrics()
+        for name, value in values.items():
+            self.stdout.write(f'{name}: {value}')
+        self.stdout.write(
+            'Избежано пересчётов: {}'.format(
+                values['served_stale'] + values['coalesced']
+            )
+        )
+        if reset:
+            stampede.reset_metrics()
@@ -0,0 +1,79 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_vary_headers
+
+from . import stampede
+
+CHANGED_KEY = 'page_cache:changed:{}'
+PAGE_KEY = 'page_cache:page:{}:{}'
+
+
+def touch(*scopes):
+    """Отмечает, что данные для страниц этих областей изменились."""
+    now = time.time()
+    cache.set_many(
+        {CHANGED_KEY.format(scope): now for scope in scopes},
+        timeout=None
+    )
+
+
+def last_changed(scopes):
+    """Время последнего изменения любой из областей.
+
+    Неизвестная область (например, вытесненная из кеша) считается
+    изменённой только что: лишний промах лучше устаревшей страницы.
+    """
+    keys = [CHANGED_KEY.format(scope) for scope in scopes]
+    stamps = cache.get_many(keys)
+    missing = [key for key in keys if key not in stamps]
+    if missing:
+        now = time.time()
+        for key in missing:
+            cache.add(key, now, timeout=None)
+        stamps.update(cache.get_many(missing))
+    return max(stamps.values())
+
+
+def cache_anonymous_page(scopes):
+    """Кеширует страницу целиком для анонимных читателей.
+
+    scopes(**view_kwargs) возвращает области данных, от которых
+    зависит страница; по времени их изменения считается ETag, так что
+    повторный запрос получает 304. Last-Modified не отдаётся: с точностью
+    до секунды он дал бы 304 на изменение в ту же секунду.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (
+                request.method not in ('GET', 'HEAD')
+                or request.user.is_authenticated
+            ):
+                return view(request, *args, **kwargs)
+            changed = last_changed(scopes(**kwargs))
+            path = request.get_full_path()
+            etag = '"{}"'.format(
+                hashlib.md5(f'{path}:{changed}'.encode()).hexdigest()
+            )
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                key = PAGE_KEY.format(
+                    hashlib.md5(path.encode()).hexdigest(), changed
+                )
+                response = stampede.fetch(
+                    key,
+                    lambda: view(request, *args, **kwargs),
+                    settings.ANONYMOUS_PAGE_CACHE_TIMEOUT,
+                    cacheable=lambda response: response.status_code == 200
+                )
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                response['Cache-Control'] = 'no-cache'
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
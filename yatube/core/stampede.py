@@ -0,0 +1,94 @@
+import math
+import random
+import time
+
+from django.core.cache import cache
+
+LOCK_KEY = 'stampede:lock:{}'
+METRIC_KEY = 'stampede:metric:{}'
+METRICS = ('recomputes', 'early_refreshes', 'served_stale', 'coalesced')
+# Сколько секунд держится блокировка пересчёта, если процесс упал.
+LOCK_TIMEOUT = 30
+# Сколько ждать чужого пересчёта, когда отдать нечего.
+WAIT_TIMEOUT = 5
+WAIT_STEP = 0.05
+# Чем больше, тем раньше до истечения срока начинается пересчёт.
+BETA = 1.0
+
+
+def record(metric):
+    key = METRIC_KEY.format(metric)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def metrics():
+    """Счётчики пересчётов и пересчётов, которых удалось избежать."""
+    values = cache.get_many([METRIC_KEY.format(name) for name in METRICS])
+    return {
+        name: values.get(METRIC_KEY.format(name), 0) for name in METRICS
+    }
+
+
+def reset_metrics():
+    cache.delete_many([METRIC_KEY.format(name) for name in METRICS])
+
+
+def _compute(key, compute, timeout, cacheable):
+    lock_key = LOCK_KEY.format(key)
+    try:
+        started = time.monotonic()
+        value = compute()
+        delta = time.monotonic() - started
+        if cacheable is None or cacheable(value):
+            expires = None if timeout is None else time.time() + timeout
+            cache.set(
+                key,
+                (value, delta, expires),
+                None if timeout is None else timeout + LOCK_TIMEOUT
+            )
+        return value
+    finally:
+        cache.delete(lock_key)
+
+
+def fetch(key, compute, timeout, cacheable=None):
+    """Значение из кеша; при промахе его считает только один запрос.
+
+    Запись хранит время вычисления и срок годности. Незадолго до
+    истечения срока запрос с вероятностью, растущей к концу срока,
+    пересчитывает значение заранее (XFetch). Пока идёт пересчёт,
+    остальные запросы получают прежнее значение, а если его нет -
+    ждут результата, но не дольше WAIT_TIMEOUT.
+    """
+    lock_key = LOCK_KEY.format(key)
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expires = entry
+        now = time.time()
+        if expires is None or (
+            now - delta * BETA * math.log(1 - random.random()) < expires
+        ):
+            return value
+        if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+            record('served_stale')
+            return value
+        record('early_refreshes' if now < expires else 'recomputes')
+        return _compute(key, compute, timeout, cacheable)
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        record('recomputes')
+        return _compute(key, compute, timeout, cacheable)
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_STEP)
+        entry = cache.get(key)
+        if entry is not None:
+            record('coalesced')
+            return entry[0]
+        if not cache.has_key(lock_key):
+            break
+    record('recomputes')
+    return compute()
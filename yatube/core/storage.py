@@ -0,0 +1,79 @@
+import hashlib
+import os
+import posixpath
+import secrets
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# Временный файл открывается с правами 0666, которые ядро урезает
+# по umask процесса, - как у обычного сохранения FileSystemStorage.
+TEMP_FLAGS = (
+    os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+)
+
+
+@deconstructible
+class HashedFileSystemStorage(FileSystemStorage):
+    """Хранилище, где имя файла - хеш его содержимого.
+
+    Файл <каталог>/ab/abcdef....jpg сохраняется один раз, сколько бы
+    раз его ни загрузили; повторная загрузка просто возвращает имя
+    существующего файла. Адресом служит хеш загруженных байтов, даже
+    если потом файл перезаписан методом replace() (например, ужат).
+    """
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        directory = posixpath.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return posixpath.join(directory, digest[:2], digest + extension)
+
+    def content_name(self, name, content):
+        """Имя, под которым save(name, content) сохранит файл."""
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        return self.hashed_name(self.generate_filename(name), content)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
+
+    def get_available_name(self, name, max_length=None):
+        # Одинаковые имена значат одинаковое содержимое.
+        return name
+
+    def replace(self, name, content):
+        """Атомарно перезаписывает файл name, не меняя имени."""
+        return self._save(name, content)
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        if self.directory_permissions_mode is not None:
+            os.chmod(directory, self.directory_permissions_mode)
+        temp_path = os.path.join(directory, f'.tmp{secrets.token_hex(8)}')
+        descriptor = os.open(temp_path, TEMP_FLAGS, 0o666)
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                for chunk in content.chunks():
+                    file.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+            os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
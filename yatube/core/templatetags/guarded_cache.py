@@ -0,0 +1,49 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+
+from core import stampede
+
+register = template.Library()
+
+
+class GuardedCacheNode(template.Node):
+    def __init__(self, nodelist, timeout, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.timeout = timeout
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        timeout = self.timeout.resolve(context)
+        if timeout is not None:
+            timeout = int(timeout)
+        key = make_template_fragment_key(
+            self.fragment_name,
+            [var.resolve(context) for var in self.vary_on]
+        )
+        return stampede.fetch(
+            key,
+            lambda: self.nodelist.render(context),
+            timeout
+        )
+
+
+@register.tag
+def guarded_cache(parser, token):
+    """Как {% cache %}, но фрагмент пересчитывает только один запрос.
+
+    {% guarded_cache timeout name [var1 var2 ...] %}...{% endguarded_cache %}
+    """
+    nodelist = parser.parse(('endguarded_cache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            f'{tokens[0]!r} tag requires at least 2 arguments.'
+        )
+    return GuardedCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(token) for token in tokens[3:]],
+    )
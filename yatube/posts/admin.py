@@ -1,9 +1,240 @@
 from .models import Comment, Follow, Group, Post
+from . import bulk, search
+from .pagination import CursorPaginator, estimated_count
 
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME, ActionForm
+from django.contrib.admin.views.main import ORDER_VAR, PAGE_VAR, ChangeList
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import ValidationError
+from django.db.models.functions import Substr
+from django.http import Http404
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.html import format_html
+from django.utils.text import Truncator
+from django.utils.translation import gettext_lazy as _
 
+CURSOR_VAR = 'cursor'
+TEXT_PREVIEW_LENGTH = 80
 
-class PostAdmin(admin.ModelAdmin):
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """Фильтр по внешнему ключу с поиском вместо списка всех значений.
+
+    Варианты подгружаются постранично тем же JSON-запросом, что и
+    в autocomplete_fields, поэтому связанная таблица целиком не
+    читается. Админке с таким фильтром нужен AutocompleteFilterMixin.
+    """
+    template = 'admin/posts/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin,
+                 field_path):
+        self.lookup_kwarg = f'{field_path}__{field.target_field.name}__exact'
+        self.lookup_val = params.get(self.lookup_kwarg)
+        super().__init__(
+            field, request, params, model, model_admin, field_path
+        )
+        self.form_field = forms.ModelChoiceField(
+            queryset=field.remote_field.model._default_manager.all(),
+            widget=AutocompleteSelect(
+                field.remote_field,
+                model_admin.admin_site,
+                attrs={'data-width': '100%'},
+            ),
+            required=False,
+        )
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def has_output(self):
+        return True
+
+    def widget(self):
+        return self.form_field.widget.render(
+            self.lookup_kwarg, self.lookup_val
+        )
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.lookup_val is None,
+            'query_string': changelist.get_query_string(
+                {}, [self.lookup_kwarg]
+            ),
+            'display': _('All'),
+        }
+
+
+class AutocompleteFilterMixin:
+    """Подключает к списку скрипты для AutocompleteFilter."""
+
+    @property
+    def media(self):
+        return (
+            super().media
+            + AutocompleteSelect(None, self.admin_site).media
+            + forms.Media(js=['js/admin/autocomplete_filter.js'])
+        )
+
+
+class BulkActionsMixin:
+    """Действия над выборкой пачками UPDATE/DELETE (см. posts.bulk).
+
+    Большие выборки обрабатываются в фоне, а их ход показывает
+    отдельная страница админки.
+    """
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path(
+                'bulk/<str:job_id>/',
+                self.admin_site.admin_view(self.bulk_job_view),
+                name='%s_%s_bulk_job' % info,
+            ),
+        ] + super().get_urls()
+
+    def start_bulk(self, request, title, action, queryset, *args):
+        job_id = bulk.start(title, action, queryset, *args)
+        job = bulk.job(job_id)
+        if job['finished']:
+            self.message_user(
+                request,
+                f'{title}: обработано {job["done"]} из {job["total"]}.',
+                messages.ERROR if job['failed'] else messages.SUCCESS,
+            )
+            return
+        info = self.model._meta.app_label, self.model._meta.model_name
+        self.message_user(request, format_html(
+            '{}: {} строк обрабатываются в фоне, '
+            '<a href="{}">ход выполнения</a>.',
+            title,
+            job['total'],
+            reverse('admin:%s_%s_bulk_job' % info, args=[job_id]),
+        ))
+
+    def bulk_job_view(self, request, job_id):
+        job = bulk.job(job_id)
+        if job is None:
+            raise Http404('Задача не найдена.')
+        return TemplateResponse(request, 'admin/posts/bulk_job.html', {
+            **self.admin_site.each_context(request),
+            'title': job['title'],
+            'opts': self.model._meta,
+            'job': job,
+        })
+
+    def confirm_bulk_delete(self, request, queryset, action):
+        """Страница подтверждения, на которой объекты не загружаются."""
+        return TemplateResponse(
+            request,
+            'admin/posts/bulk_delete_confirmation.html',
+            {
+                **self.admin_site.each_context(request),
+                'title': 'Вы уверены?',
+                'opts': self.model._meta,
+                'count': queryset.count(),
+                'action': action,
+                'action_checkbox_name': ACTION_CHECKBOX_NAME,
+                'selected': request.POST.getlist(ACTION_CHECKBOX_NAME),
+                'select_across': request.POST.get('select_across'),
+            }
+        )
+
+
+class IndexedSearchMixin:
+    """Поиск в админке по полнотекстовому индексу вместо LIKE '%...%'."""
+    search_index = search.POST_INDEX
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search.matching(queryset, search_term, self.search_index), False
+
+
+class GroupChoiceField(forms.ModelChoiceField):
+    """Выбор группы из списка, загруженного один раз на всю страницу.
+
+    Обычное поле выбирает группы заново для каждой строки списка
+    и для каждой строки рисует ссылки добавления и изменения.
+    """
+
+    def __init__(self, groups, **kwargs):
+        self.groups = {str(group.pk): group for group in groups}
+        super().__init__(queryset=Group.objects.none(), **kwargs)
+        self.choices = [('', self.empty_label)] + [
+            (pk, group.title) for pk, group in self.groups.items()
+        ]
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return self.groups[str(value)]
+        except KeyError:
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+            )
+
+
+class PostChangeList(ChangeList):
+    """Список постов, который не замедляется с ростом таблицы.
+
+    Число постов оценивается, а при сортировке по умолчанию страницы
+    выбираются по ключу (pub_date, id) последнего поста, как в ленте:
+    сначала ключи страницы по индексу, затем сами строки по ним.
+    """
+
+    def get_filters_params(self, params=None):
+        params = super().get_filters_params(params)
+        params.pop(CURSOR_VAR, None)
+        return params
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('text').annotate(
+            text_preview=Substr('text', 1, TEXT_PREVIEW_LENGTH + 1)
+        )
+
+    def get_results(self, request):
+        super().get_results(request)
+        self.result_count_exact = self.paginator.count_exact
+        self.keyset = ORDER_VAR not in self.params and not (
+            self.show_all and self.can_show_all
+        )
+        if not self.keyset:
+            return
+        paginator = CursorPaginator(
+            self.queryset.select_related(None).only('id', 'pub_date'),
+            self.list_per_page
+        )
+        page = paginator.get_page(self.params.get(CURSOR_VAR))
+        self.paginator = paginator
+        self.result_list = self.queryset.filter(
+            pk__in=[post.id for post in page]
+        )
+        self.page_num = page.number - 1
+        self.next_url = page.next_cursor and self.get_query_string(
+            {CURSOR_VAR: page.next_cursor}, [PAGE_VAR]
+        )
+        self.previous_url = page.previous_cursor and self.get_query_string(
+            {CURSOR_VAR: page.previous_cursor}, [PAGE_VAR]
+        )
+
+
+class PostActionForm(ActionForm):
+    group = forms.ModelChoiceField(
+        Group.objects.order_by('title'),
+        required=False,
+        label='Группа',
+        empty_label='Без группы',
+    )
+
+
+class PostAdmin(BulkActionsMixin, AutocompleteFilterMixin,
+                IndexedSearchMixin, admin.ModelAdmin):
     list_display = (
         'pk',
         'text',
@@ -12,9 +243,66 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
-    list_filter = ('pub_date',)
+    list_filter = ('pub_date', ('author', AutocompleteFilter))
+    autocomplete_fields = ('author',)
     empty_value_display = '-пусто-'
+    show_full_result_count = False
+    action_form = PostActionForm
+    actions = ('move_to_group',)
+
+    def move_to_group(self, request, queryset):
+        form = self.action_form(request.POST)
+        form.fields['action'].choices = self.get_action_choices(request)
+        if not form.is_valid():
+            self.message_user(request, 'Выберите группу.', messages.ERROR)
+            return
+        group = form.cleaned_data['group']
+        self.start_bulk(
+            request,
+            f'Перенос в группу «{group or "без группы"}»',
+            bulk.move_posts,
+            queryset,
+            group and group.pk,
+        )
+    move_to_group.short_description = 'Перенести в выбранную группу'
+    move_to_group.allowed_permissions = ('change',)
+
+    def get_queryset(self, request):
+        # Подписи постов в поиске для autocomplete включают автора.
+        return super().get_queryset(request).select_related('author')
+
+    def get_list_display(self, request):
+        # В списке вместо полного текста - его начало, обрезанное в базе.
+        return tuple(
+            'text_preview' if name == 'text' else name
+            for name in self.list_display
+        )
+
+    def get_changelist(self, request, **kwargs):
+        return PostChangeList
+
+    def get_changelist_form(self, request, **kwargs):
+        form = super().get_changelist_form(request, **kwargs)
+        field = form.base_fields['group']
+        form.base_fields['group'] = GroupChoiceField(
+            Group.objects.only('id', 'title').order_by('title'),
+            required=False,
+            label=field.label,
+        )
+        return form
+
+    def get_paginator(self, request, queryset, per_page, **kwargs):
+        paginator = super().get_paginator(
+            request, queryset, per_page, **kwargs
+        )
+        paginator.count, paginator.count_exact = estimated_count(queryset)
+        return paginator
+
+    def text_preview(self, post):
+        return Truncator(post.text_preview).chars(TEXT_PREVIEW_LENGTH)
+    text_preview.short_description = 'Текст'
 
 
 admin.site.register(Post, PostAdmin)
@@ -32,27 +320,63 @@ class GroupAdmin(admin.ModelAdmin):
 admin.site.register(Group, GroupAdmin)
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(BulkActionsMixin, AutocompleteFilterMixin,
+                   IndexedSearchMixin, admin.ModelAdmin):
+    search_index = search.COMMENT_INDEX
     list_display = (
-        'post',
+        'post_preview',
         'author',
         'text',
         'created',
     )
+    list_select_related = ('author',)
     search_fields = ('text',)
-    list_filter = ('created',)
+    list_filter = ('created', ('author', AutocompleteFilter))
+    autocomplete_fields = ('post', 'author')
     empty_value_display = '-пусто-'
+    actions = ('delete_in_batches',)
+
+    def delete_in_batches(self, request, queryset):
+        if request.POST.get('post') != 'yes':
+            return self.confirm_bulk_delete(
+                request, queryset, 'delete_in_batches'
+            )
+        self.start_bulk(
+            request, 'Удаление комментариев', bulk.delete_comments, queryset
+        )
+    delete_in_batches.short_description = 'Удалить выбранные пачками'
+    delete_in_batches.allowed_permissions = ('delete',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            post_preview=Substr('post__text', 1, TEXT_PREVIEW_LENGTH + 1)
+        )
+
+    def post_preview(self, comment):
+        if comment.post_id is None:
+            return self.empty_value_display
+        return '#{} {}'.format(
+            comment.post_id,
+            Truncator(comment.post_preview).chars(TEXT_PREVIEW_LENGTH)
+        )
+    post_preview.short_description = 'Пост'
+    post_preview.admin_order_field = 'post'
 
 
 admin.site.register(Comment, CommentAdmin)
 
 
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
     list_display = (
         'author',
         'user',
     )
-    list_filter = ('author', 'user',)
+    list_select_related = ('author', 'user')
+    list_filter = (
+        ('author', AutocompleteFilter),
+        ('user', AutocompleteFilter),
+    )
+    autocomplete_fields = ('author', 'user')
     empty_value_display = '-пусто-'
 
 
@@ -0,0 +1,144 @@
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import cache, search
+from .models import Comment, Post
+
+logger = logging.getLogger(__name__)
+
+JOB_KEY = 'posts:bulk:{}'
+JOB_TIMEOUT = 60 * 60 * 24
+
+_executor = None
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.BULK_ACTION_WORKERS,
+            thread_name_prefix='bulk'
+        )
+    return _executor
+
+
+def batches(queryset):
+    """Первичные ключи queryset пачками по BULK_ACTION_BATCH_SIZE.
+
+    Каждая пачка выбирается заново по ключу после последней, поэтому
+    строки, изменённые или удалённые предыдущей пачкой, не мешают
+    следующей.
+    """
+    rows = queryset.order_by('pk').values_list('pk', flat=True)
+    last = None
+    while True:
+        page = rows if last is None else rows.filter(pk__gt=last)
+        ids = list(page[:settings.BULK_ACTION_BATCH_SIZE])
+        if not ids:
+            return
+        yield ids
+        last = ids[-1]
+
+
+def move_posts(queryset, group_id, progress):
+    """Переносит посты в группу пачками UPDATE без сигналов."""
+    try:
+        for ids in batches(queryset):
+            Post.objects.filter(pk__in=ids).update(
+                group_id=group_id,
+                updated=timezone.now(),
+            )
+            progress(len(ids))
+    finally:
+        # Перенос меняет ленты групп, главную и профили авторов; кеш
+        # сбрасывается и тогда, когда задача прервалась на полпути.
+        cache.bump_feed_generation()
+        cache.touch_all_pages()
+
+
+def delete_comments(queryset, progress):
+    """Удаляет комментарии пачками DELETE без сигналов.
+
+    Вместо обработчиков post_delete пачка сама убирает комментарии
+    из поискового индекса и сбрасывает кеш страниц их постов.
+    """
+    for ids in batches(queryset):
+        comments = Comment.objects.filter(pk__in=ids)
+        with transaction.atomic():
+            post_ids = set(comments.values_list('post_id', flat=True))
+            search.unindex_comments(ids)
+            # delete() из-за обработчиков post_delete у Comment загрузил
+            # бы каждый комментарий и разослал сигналы по одному; их
+            # работу пачка делает сама, а ссылок на комментарии нет.
+            comments._raw_delete(comments.db)
+        cache.touch_posts_pages(post_ids - {None})
+        progress(len(ids))
+
+
+def job(job_id):
+    """Состояние задачи или None, если она неизвестна."""
+    return default_cache.get(JOB_KEY.format(job_id))
+
+
+def _save_job(job_id, state):
+    default_cache.set(JOB_KEY.format(job_id), state, JOB_TIMEOUT)
+
+
+def _run(job_id, action, queryset, args):
+    state = job(job_id)
+
+    def progress(count):
+        state['done'] += count
+        _save_job(job_id, state)
+
+    try:
+        action(queryset, *args, progress=progress)
+    except Exception:
+        logger.exception('Задача %s (%s) прервана', job_id, state['title'])
+        state['failed'] = True
+    finally:
+        state['finished'] = True
+        _save_job(job_id, state)
+
+
+def _run_in_pool(job_id, action, queryset, args):
+    try:
+        _run(job_id, action, queryset, args)
+    finally:
+        # Поток пула живёт долго, соединение с БД ему больше не нужно.
+        close_old_connections()
+
+
+def start(title, action, queryset, *args):
+    """Запускает action(queryset, *args, progress=...) над выборкой.
+
+    Выборка не больше BULK_ACTION_BACKGROUND_THRESHOLD строк
+    обрабатывается сразу, большая - в фоне после фиксации транзакции.
+    Возвращает id задачи; её ход виден через job().
+    """
+    job_id = uuid.uuid4().hex
+    total = queryset.count()
+    background = total > settings.BULK_ACTION_BACKGROUND_THRESHOLD
+    _save_job(job_id, {
+        'title': title,
+        'total': total,
+        'done': 0,
+        'background': background,
+        'finished': False,
+        'failed': False,
+    })
+    if not background:
+        _run(job_id, action, queryset, args)
+    elif settings.BULK_ACTION_WORKERS:
+        transaction.on_commit(lambda: executor().submit(
+            _run_in_pool, job_id, action, queryset, args
+        ))
+    else:
+        transaction.on_commit(lambda: _run(job_id, action, queryset, args))
+    return job_id
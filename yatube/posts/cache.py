@@ -0,0 +1,124 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from core import page_cache
+
+from .models import Group
+
+FEED_GENERATION_KEY = 'posts:feed_generation'
+CARDS_GENERATION_KEY = 'posts:cards_generation'
+
+
+def get_generation(key):
+    """Текущее поколение группы ключей кеша."""
+    generation = cache.get(key)
+    if generation is None:
+        # Начинаем со времени, чтобы после вытеснения ключа поколение
+        # не вернулось к старому значению и не оживило старые записи.
+        cache.add(key, int(time.time()), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def now_and_after_commit(func):
+    """Вызывает func сразу и, внутри транзакции, ещё раз после коммита.
+
+    Первый вызов нужен, чтобы сама транзакция не читала старый кеш,
+    второй - чтобы параллельный запрос, успевший сохранить данные
+    до коммита, не оставил их под новым ключом.
+    """
+    func()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(func)
+
+
+def bump_generation(key):
+    """Делает устаревшими все записи, в ключ которых входит поколение."""
+    now_and_after_commit(lambda: incr_generation(key))
+
+
+def incr_generation(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        get_generation(key)
+
+
+def feed_generation():
+    return get_generation(FEED_GENERATION_KEY)
+
+
+def bump_feed_generation():
+    bump_generation(FEED_GENERATION_KEY)
+
+
+def cards_generation():
+    return get_generation(CARDS_GENERATION_KEY)
+
+
+def bump_cards_generation():
+    bump_generation(CARDS_GENERATION_KEY)
+
+
+def card_key(post, generation, variant):
+    return (
+        f'posts:card:{generation}:{post.id}:'
+        f'{post.updated.timestamp()}:{variant}'
+    )
+
+
+SITE_SCOPE = 'site'
+INDEX_SCOPE = 'index'
+
+
+def index_scopes():
+    return (SITE_SCOPE, INDEX_SCOPE)
+
+
+def group_scopes(slug):
+    return (SITE_SCOPE, f'group:{slug}')
+
+
+def profile_scopes(username):
+    return (SITE_SCOPE, f'author:{username}')
+
+
+def post_scopes(post_id):
+    return (SITE_SCOPE, f'post:{post_id}')
+
+
+def touch_pages(*scopes):
+    now_and_after_commit(lambda: page_cache.touch(*scopes))
+
+
+def touch_post_pages(post, group_ids):
+    slugs = Group.objects.filter(
+        id__in=[group_id for group_id in group_ids if group_id]
+    ).values_list('slug', flat=True)
+    touch_pages(
+        INDEX_SCOPE,
+        f'post:{post.id}',
+        f'author:{post.author.username}',
+        *(f'group:{slug}' for slug in slugs)
+    )
+
+
+def touch_comment_pages(comment):
+    touch_pages(f'post:{comment.post_id}')
+
+
+def touch_posts_pages(post_ids):
+    touch_pages(*(f'post:{post_id}' for post_id in post_ids))
+
+
+def touch_follow_pages(follow):
+    touch_pages(
+        f'author:{follow.author.username}',
+        f'author:{follow.user.username}'
+    )
+
+
+def touch_all_pages():
+    touch_pages(SITE_SCOPE)
@@ -0,0 +1,74 @@
+import io
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .models import Post
+
+SAVE_OPTIONS = {
+    'JPEG': {'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {},
+}
+
+
+# Что из image.info переживает перекодирование: цветовой профиль
+# и прозрачность. EXIF, XMP и текстовые блоки PNG (в них бывают
+# координаты и модель камеры) отбрасываются.
+KEPT_INFO = ('icc_profile', 'transparency')
+XMP_KEYS = ('xmp', 'XML:com.adobe.xmp')
+
+
+def needs_normalizing(image):
+    return (
+        max(image.size) > settings.POST_IMAGE_MAX_SIZE
+        or len(image.getexif()) > 0
+        or any(key in image.info for key in XMP_KEYS)
+        or bool(getattr(image, 'text', None))
+    )
+
+
+def normalize(name):
+    """Уменьшает загруженную картинку и убирает из неё EXIF.
+
+    Картинка поворачивается по тегу Orientation, ужимается до
+    POST_IMAGE_MAX_SIZE по большей стороне и перекодируется в том же
+    формате под тем же именем, поэтому ссылки на неё не меняются.
+    Анимации и форматы без перекодирования остаются как есть.
+    Возвращает имя файла картинки.
+    """
+    storage = Post._meta.get_field('image').storage
+    with storage.open(name) as file:
+        image = Image.open(file)
+        image_format = image.format
+        if (
+            image_format not in SAVE_OPTIONS
+            or getattr(image, 'is_animated', False)
+            or not needs_normalizing(image)
+        ):
+            return name
+        image = ImageOps.exif_transpose(image)
+        image.info = {
+            key: value for key, value in image.info.items()
+            if key in KEPT_INFO
+        }
+        image.thumbnail(
+            (settings.POST_IMAGE_MAX_SIZE, settings.POST_IMAGE_MAX_SIZE),
+            Image.LANCZOS
+        )
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(
+        buffer,
+        format=image_format,
+        quality=settings.POST_IMAGE_QUALITY,
+        # Без явного exif PNG и WebP берут его из image.info.
+        exif=b'',
+        **SAVE_OPTIONS[image_format]
+    )
+    # Имя файла - хеш загруженных байтов, поэтому ужатая версия
+    # записывается на его место и одинаковые загрузки её разделяют.
+    storage.replace(name, ContentFile(buffer.getvalue()))
+    return name
@@ -0,0 +1,196 @@
+import posixpath
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.helpers import deserialize
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix, del_prefix
+from sorl.thumbnail.models import KVStore
+
+from posts import media, thumbnails
+from posts.models import MediaFile, Post
+
+
+def walk(storage, path):
+    """Имена всех файлов под path, каталог за каталогом."""
+    if not storage.exists(path):
+        return
+    directories, files = storage.listdir(path)
+    for name in sorted(files):
+        yield posixpath.join(path, name)
+    for directory in sorted(directories):
+        yield from walk(storage, posixpath.join(path, directory))
+
+
+def batches(names, size):
+    batch = []
+    for name in names:
+        batch.append(name)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки постов и миниатюры, на которые ничто '
+        'не ссылается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, что будет удалено.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько файлов сверять с базой за один запрос.',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=24,
+            help='Не трогать файлы моложе стольких часов.',
+        )
+
+    def handle(self, *args, dry_run, batch_size, min_age, **options):
+        self.dry_run = dry_run
+        self.verbosity = options['verbosity']
+        self.cutoff = timezone.now() - timedelta(hours=min_age)
+        images = media.storage()
+        upload_to = Post._meta.get_field('image').upload_to.rstrip('/')
+        found, size = 0, 0
+        for batch in batches(walk(images, upload_to), batch_size):
+            orphans = self.old(images, set(batch) - self.images_in_use(batch))
+            found += len(orphans)
+            size += self.remove(images, orphans, media.discard)
+        sets, set_files, set_size = self.collect_thumbnail_sets(batch_size)
+        found += set_files
+        size += set_size
+        cached = default.storage
+        prefix = thumbnail_settings.THUMBNAIL_PREFIX.rstrip('/')
+        for batch in batches(walk(cached, prefix), batch_size):
+            orphans = self.old(
+                cached, set(batch) - self.known_thumbnails(batch)
+            )
+            found += len(orphans)
+            size += self.remove(cached, orphans, cached.delete)
+        verb = 'Будет удалено' if dry_run else 'Удалено'
+        self.stdout.write(f'{verb} файлов: {found} ({size} байт)')
+        self.stdout.write(f'{verb} наборов миниатюр: {sets}')
+
+    def images_in_use(self, names):
+        return set(
+            Post.objects.filter(image__in=names).values_list(
+                'image', flat=True
+            )
+        ) | set(
+            MediaFile.objects.filter(name__in=names).values_list(
+                'name', flat=True
+            )
+        )
+
+    def thumbnail_sets(self, batch_size):
+        """Пачки (исходник, ключи миниатюр) из хранилища ключей sorl.
+
+        Записи читаются по ключу после последней прочитанной, поэтому
+        в памяти только одна пачка, а удаление прочитанных ничему
+        не мешает.
+        """
+        prefix = add_prefix('', 'thumbnails')
+        last = prefix
+        while True:
+            rows = list(KVStore.objects.filter(
+                key__startswith=prefix, key__gt=last
+            ).order_by('key').values_list('key', 'value')[:batch_size])
+            if not rows:
+                return
+            last = rows[-1][0]
+            rows = [
+                (add_prefix(del_prefix(key)), value) for key, value in rows
+            ]
+            sources = dict(KVStore.objects.filter(
+                key__in=[key for key, _ in rows]
+            ).values_list('key', 'value'))
+            yield [
+                (deserialize_image_file(sources[key]), deserialize(value))
+                for key, value in rows
+                if key in sources
+            ]
+
+    def collect_thumbnail_sets(self, batch_size):
+        """Удаляет наборы миниатюр картинок, на которые нет ссылок.
+
+        Набор живой, только если на его исходник ссылаются пост или
+        MediaFile и ключ исходника совпадает с тем, под которым картинки
+        постов отдаёт posts.thumbnails; наборы под другими ключами -
+        дубли. Удаление идёт через kvstore: он стирает и файлы
+        миниатюр, и записи о них. Возвращает число наборов, файлов
+        и их размер.
+        """
+        sets = files = size = 0
+        for batch in self.thumbnail_sets(batch_size):
+            in_use = self.images_in_use([
+                source.name for source, _ in batch
+            ])
+            for source, thumbnail_keys in batch:
+                if (
+                    source.name in in_use
+                    and source.key == thumbnails.source(source.name).key
+                ):
+                    continue
+                sets += 1
+                for thumbnail in self.stored_images(thumbnail_keys):
+                    if thumbnail.exists():
+                        files += 1
+                        size += thumbnail.storage.size(thumbnail.name)
+                    if self.verbosity > 1:
+                        self.stdout.write(thumbnail.name)
+                if not self.dry_run:
+                    default.kvstore.delete(source)
+        return sets, files, size
+
+    def stored_images(self, keys):
+        return [
+            deserialize_image_file(value)
+            for value in KVStore.objects.filter(
+                key__in=[add_prefix(key) for key in keys]
+            ).values_list('value', flat=True)
+        ]
+
+    def known_thumbnails(self, names):
+        """Те из файлов names, о которых есть запись у sorl."""
+        keys = {
+            add_prefix(ImageFile(name, default.storage).key): name
+            for name in names
+        }
+        return {
+            keys[key] for key in KVStore.objects.filter(
+                key__in=keys
+            ).values_list('key', flat=True)
+        }
+
+    def old(self, storage, names):
+        # Свежий файл может принадлежать посту, который ещё сохраняется.
+        return sorted(
+            name for name in names
+            if storage.get_modified_time(name) < self.cutoff
+        )
+
+    def remove(self, storage, names, delete):
+        size = 0
+        for name in names:
+            size += storage.size(name)
+            if self.verbosity > 1:
+                self.stdout.write(name)
+            if not self.dry_run:
+                delete(name)
+        return size
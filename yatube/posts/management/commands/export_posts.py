@@ -0,0 +1,51 @@
+import sys
+
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+
+from posts import media, transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает группы, посты, комментарии и подписки в JSONL, '
+        'по записи в строке.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='Файл выгрузки; "-" - стандартный вывод.',
+        )
+        parser.add_argument(
+            '--media',
+            dest='media_dir',
+            help='Каталог, куда скопировать картинки постов.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Сколько строк читать из базы за раз.',
+        )
+
+    def handle(self, *args, path, media_dir, chunk_size, **options):
+        if path == '-':
+            output, report = sys.stdout, self.stderr
+        else:
+            output, report = open(path, 'w', encoding='utf-8'), self.stdout
+        written = 0
+        try:
+            for line in transfer.export_lines(chunk_size):
+                output.write(line + '\n')
+                written += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        if media_dir:
+            transfer.copy_media(
+                transfer.exported_images(chunk_size),
+                media.storage(),
+                FileSystemStorage(location=media_dir),
+            )
+        report.write(f'Выгружено записей: {written}')
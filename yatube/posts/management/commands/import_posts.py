@@ -0,0 +1,53 @@
+import sys
+
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from posts import cache, transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает выгрузку export_posts. Уже загруженные записи '
+        'пропускаются, записи с id, занятым другими, получают новый id, '
+        'отсутствующие авторы заводятся без пароля.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='Файл выгрузки; "-" - стандартный ввод.',
+        )
+        parser.add_argument(
+            '--media',
+            dest='media_dir',
+            help='Каталог с картинками постов из выгрузки.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько записей вставлять одной транзакцией.',
+        )
+
+    def handle(self, *args, path, media_dir, batch_size, **options):
+        images = FileSystemStorage(location=media_dir) if media_dir else None
+        source = (
+            sys.stdin if path == '-' else open(path, encoding='utf-8')
+        )
+        try:
+            counts = transfer.import_lines(source, batch_size, images)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        # bulk_create обходит сигналы, счётчики профилей сводим заново.
+        call_command('recount_user_stats', stdout=self.stdout)
+        # Ленты, карточки и страницы целиком собраны до загрузки.
+        cache.bump_feed_generation()
+        cache.bump_cards_generation()
+        cache.touch_all_pages()
+        self.stdout.write(
+            'Загружено: групп {group}, постов {post}, комментариев '
+            '{comment}, подписок {follow}'.format(**counts)
+        )
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from posts.models import Follow, Post, User, UserStats
+
+FIELDS = ('posts_count', 'followers_count', 'following_count')
+
+
+def grouped_counts(queryset, field, user_ids):
+    return dict(
+        queryset.filter(**{f'{field}__in': user_ids})
+        .values_list(field)
+        .annotate(total=Count('pk'))
+        .order_by()
+    )
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов и подписок пользователей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько пользователей пересчитывать за один проход.',
+        )
+
+    def handle(self, *args, batch_size, **options):
+        fixed = 0
+        last_id = 0
+        while True:
+            user_ids = list(User.objects.filter(
+                id__gt=last_id
+            ).order_by('id').values_list('id', flat=True)[:batch_size])
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+            with transaction.atomic():
+                fixed += self.reconcile(user_ids)
+        self.stdout.write(f'Исправлено записей: {fixed}')
+
+    def reconcile(self, user_ids):
+        posts = grouped_counts(Post.objects, 'author_id', user_ids)
+        followers = grouped_counts(Follow.objects, 'author_id', user_ids)
+        following = grouped_counts(Follow.objects, 'user_id', user_ids)
+        existing = UserStats.objects.select_for_update().in_bulk(user_ids)
+        missing, drifted = [], []
+        for user_id in user_ids:
+            actual = (
+                posts.get(user_id, 0),
+                followers.get(user_id, 0),
+                following.get(user_id, 0),
+            )
+            stats = existing.get(user_id)
+            if stats is None:
+                missing.append(UserStats(
+                    user_id=user_id, **dict(zip(FIELDS, actual))
+                ))
+            elif tuple(getattr(stats, field) for field in FIELDS) != actual:
+                for field, value in zip(FIELDS, actual):
+                    setattr(stats, field, value)
+                drifted.append(stats)
+        UserStats.objects.bulk_create(missing, ignore_conflicts=True)
+        UserStats.objects.bulk_update(drifted, FIELDS)
+        return len(missing) + len(drifted)
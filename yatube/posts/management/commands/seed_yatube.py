@@ -0,0 +1,326 @@
+import io
+import itertools
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.text import capfirst
+from PIL import Image
+
+from posts import cache, media, search, timeline, transfer
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+
+WORDS = (
+    'котик собака утро город река лес книга чай дождь солнце музыка '
+    'дорога окно друг сад море поезд зима лето вечер письмо фото '
+    'работа отпуск кофе снег парк мост улица небо ветер'
+).split()
+# Больше разных картинок не нужно: одинаковые файлы всё равно хранятся
+# один раз, а миниатюр на каждую хватит для проверки страниц.
+IMAGE_VARIANTS = 20
+# Потолок числа комментариев к одному посту при тяжёлом хвосте.
+MAX_COMMENTS_PER_POST = 1000
+# Показатель хвоста числа комментариев: больше 2, чтобы у суммы
+# была конечная дисперсия и итог не скакал от зерна к зерну.
+COMMENTS_TAIL = 2.5
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def zipf_weights(count, skew):
+    """Накопленные веса закона Ципфа: k-й по рангу весит 1 / k ** skew."""
+    return list(itertools.accumulate(
+        1 / rank ** skew for rank in range(1, count + 1)
+    ))
+
+
+def lomax_scale(average, alpha, cap):
+    """Масштаб Ломакса, при котором среднее min(X, cap) равно average.
+
+    Ломакс - это Парето, сдвинутое к нулю. Среднее min(X, cap) равно
+    scale / (alpha - 1) * (1 - (1 + cap / scale) ** (1 - alpha))
+    и растёт вместе со scale, поэтому масштаб находится делением
+    отрезка пополам.
+    """
+    def mean(scale):
+        return scale / (alpha - 1) * (1 - (1 + cap / scale) ** (1 - alpha))
+
+    low, high = 0, average * (alpha - 1)
+    while mean(high) < average:
+        high *= 2
+    for _ in range(100):
+        middle = (low + high) / 2
+        if mean(middle) < average:
+            low = middle
+        else:
+            high = middle
+    return high
+
+
+def text(rng, low, high):
+    return ' '.join(rng.choices(WORDS, k=rng.randint(low, high))).capitalize()
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами, '
+        'постами, комментариями и подписками для проверки под нагрузкой.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument(
+            '--comments',
+            type=float,
+            default=2,
+            help='Сколько комментариев в среднем на пост.',
+        )
+        parser.add_argument(
+            '--follows',
+            type=float,
+            default=20,
+            help='Сколько подписок в среднем у пользователя.',
+        )
+        parser.add_argument(
+            '--images',
+            type=float,
+            default=0,
+            help='Доля постов с картинкой, от 0 до 1.',
+        )
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=1.0,
+            help=(
+                'Показатель закона Ципфа для активности авторов и числа '
+                'подписчиков; 0 - равномерно.'
+            ),
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='За сколько последних дней распределить посты.',
+        )
+        parser.add_argument(
+            '--prefix',
+            default='seed',
+            help='Начало имён пользователей и адресов групп.',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--seed',
+            type=int,
+            help='Зерно генератора, чтобы повторить ту же базу.',
+        )
+
+    def handle(self, *args, **options):
+        if not 0 <= options['images'] <= 1:
+            raise CommandError('--images задаётся долей от 0 до 1.')
+        if not 0 <= options['comments'] < MAX_COMMENTS_PER_POST:
+            raise CommandError(
+                f'--comments задаётся от 0 до {MAX_COMMENTS_PER_POST}.'
+            )
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = options['prefix']
+        user_ids = self.create_users(options['users'])
+        group_ids = self.create_groups(options['groups'])
+        weights = zipf_weights(len(user_ids), options['skew'])
+        # Популярность и плодовитость не связаны: иначе у самых
+        # читаемых авторов окажется и больше всего постов, и ленты
+        # разрастутся квадратично.
+        popular = self.rng.sample(user_ids, len(user_ids))
+        self.create_follows(user_ids, popular, weights, options['follows'])
+        images = self.create_images() if options['images'] else []
+        first_post_id = self.create_posts(
+            options['posts'], user_ids, weights, group_ids, images,
+            options['images'], options['days']
+        )
+        self.create_comments(
+            first_post_id, user_ids, weights, options['comments']
+        )
+        self.fill_timelines(user_ids)
+        call_command('recount_user_stats', stdout=self.stdout)
+        with transaction.atomic():
+            search.rebuild()
+        media.recount(images)
+        cache.bump_feed_generation()
+        cache.bump_cards_generation()
+        cache.touch_all_pages()
+
+    def insert(self, model, objects):
+        count = 0
+        for batch in chunked(objects, self.batch_size):
+            with transaction.atomic():
+                # Даты постов и комментариев задаются здесь, а не
+                # временем вставки.
+                transfer.insert_as_is(model, batch)
+            count += len(batch)
+        self.stdout.write(
+            f'{capfirst(model._meta.verbose_name_plural)}: {count}'
+        )
+
+    def create_users(self, count):
+        # Хеш пароля считается долго, поэтому один на всех: войти под
+        # сгенерированными пользователями нельзя.
+        password = make_password(None)
+        self.insert(User, (
+            User(username=f'{self.prefix}-user-{number}', password=password)
+            for number in range(count)
+        ))
+        return list(User.objects.filter(
+            username__startswith=f'{self.prefix}-user-'
+        ).order_by('id').values_list('id', flat=True))
+
+    def create_groups(self, count):
+        self.insert(Group, (
+            Group(
+                title=f'Группа {number}',
+                slug=f'{self.prefix}-group-{number}',
+                description=text(self.rng, 5, 20),
+            )
+            for number in range(count)
+        ))
+        return list(Group.objects.filter(
+            slug__startswith=f'{self.prefix}-group-'
+        ).values_list('id', flat=True))
+
+    def create_follows(self, user_ids, popular, weights, average):
+        """Читатели подписываются на авторов, популярных по Ципфу.
+
+        popular - пользователи от самого популярного к наименее.
+        """
+        total = int(len(user_ids) * average)
+
+        def follows():
+            for offset in range(0, total, self.batch_size):
+                authors = self.rng.choices(
+                    popular,
+                    cum_weights=weights,
+                    k=min(self.batch_size, total - offset),
+                )
+                for author_id in authors:
+                    user_id = self.rng.choice(user_ids)
+                    if user_id != author_id:
+                        yield Follow(user_id=user_id, author_id=author_id)
+
+        self.insert(Follow, follows())
+        # Авторов с толпой подписчиков ленты читают на лету.
+        timeline.pull_popular()
+
+    def create_images(self):
+        names = set()
+        for _ in range(IMAGE_VARIANTS):
+            image = Image.new('RGB', (1200, 800), tuple(
+                self.rng.randrange(256) for _ in range(3)
+            ))
+            buffer = io.BytesIO()
+            image.save(buffer, 'JPEG')
+            names.add(media.storage().save(
+                'posts/seed.jpg', ContentFile(buffer.getvalue())
+            ))
+        return sorted(names)
+
+    def create_posts(self, count, user_ids, weights, group_ids, images,
+                     image_share, days):
+        """Посты активных по Ципфу авторов, от старых к новым.
+
+        Возвращает id первого созданного поста.
+        """
+        first_id = (Post.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        start = timezone.now() - timedelta(days=days)
+        step = timedelta(days=days) / max(count, 1)
+
+        def posts():
+            for offset in range(0, count, self.batch_size):
+                size = min(self.batch_size, count - offset)
+                authors = self.rng.choices(
+                    user_ids, cum_weights=weights, k=size
+                )
+                for number, author_id in enumerate(authors, offset):
+                    pub_date = start + step * number
+                    with_image = images and self.rng.random() < image_share
+                    yield Post(
+                        text=text(self.rng, 5, 80),
+                        author_id=author_id,
+                        group_id=(
+                            self.rng.choice(group_ids)
+                            if group_ids and self.rng.random() < 0.7
+                            else None
+                        ),
+                        image=self.rng.choice(images) if with_image else '',
+                        pub_date=pub_date,
+                        updated=pub_date,
+                    )
+
+        self.insert(Post, posts())
+        return first_id
+
+    def create_comments(self, first_post_id, user_ids, weights, average):
+        """Комментарии с тяжёлым хвостом: у большинства постов их мало.
+
+        Число комментариев к посту распределено по Ломаксу с хвостом
+        COMMENTS_TAIL, поэтому изредка попадаются обсуждения на сотни
+        комментариев. Масштаб подобран так, чтобы с учётом потолка
+        MAX_COMMENTS_PER_POST среднее было average, а дробная часть
+        округляется случайно и среднее не сдвигает.
+        """
+        if not average:
+            return
+        scale = lomax_scale(average, COMMENTS_TAIL, MAX_COMMENTS_PER_POST)
+        now = timezone.now()
+
+        def comments():
+            posts = Post.objects.filter(id__gte=first_post_id).order_by(
+                'id'
+            ).values_list('id', 'pub_date')
+            for post_id, pub_date in posts.iterator(
+                chunk_size=self.batch_size
+            ):
+                count = int(self.rng.random() + min(
+                    scale * (self.rng.paretovariate(COMMENTS_TAIL) - 1),
+                    MAX_COMMENTS_PER_POST
+                ))
+                if not count:
+                    continue
+                authors = self.rng.choices(
+                    user_ids, cum_weights=weights, k=count
+                )
+                for author_id in authors:
+                    yield Comment(
+                        post_id=post_id,
+                        author_id=author_id,
+                        text=text(self.rng, 2, 30),
+                        created=pub_date + (now - pub_date) * (
+                            self.rng.random() ** 4
+                        ),
+                    )
+
+        self.insert(Comment, comments())
+
+    def fill_timelines(self, author_ids):
+        """Раскладывает посты авторов по лентам их подписчиков.
+
+        bulk_create не шлёт сигналов, поэтому ленты заполняются одним
+        INSERT ... SELECT на пачку авторов.
+        """
+        count = timeline.fill(author_ids)
+        self.stdout.write(
+            f'{capfirst(TimelineEntry._meta.verbose_name_plural)}: {count}'
+        )
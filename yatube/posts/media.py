@@ -0,0 +1,99 @@
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from sorl.thumbnail import delete as delete_thumbnails
+
+from . import thumbnails
+from .models import MediaFile, Post
+
+logger = logging.getLogger(__name__)
+
+
+def storage():
+    return Post._meta.get_field('image').storage
+
+
+def retain(name):
+    """Учитывает ещё одну ссылку на файл картинки."""
+    if MediaFile.objects.filter(name=name).update(
+        references=F('references') + 1
+    ):
+        return
+    try:
+        with transaction.atomic():
+            MediaFile.objects.create(name=name, references=1)
+    except IntegrityError:
+        MediaFile.objects.filter(name=name).update(
+            references=F('references') + 1
+        )
+
+
+def retain_upload(post):
+    """Учитывает ссылку на загруженную, но ещё не записанную картинку.
+
+    Вызывается до того, как хранилище запишет файл или найдёт уже
+    записанный с тем же содержимым. Пока ссылка учтена, discard()
+    этот файл не удалит; если он удалён раньше, хранилище запишет
+    его заново. Возвращает имя файла или None, если загрузки нет.
+    """
+    image = post.image
+    if not image or image._committed:
+        return None
+    name = storage().content_name(
+        image.field.generate_filename(post, image.name), image.file
+    )
+    retain(name)
+    return name
+
+
+def release(name):
+    """Снимает ссылку; файл без ссылок удаляется после коммита."""
+    MediaFile.objects.filter(name=name, references__gt=0).update(
+        references=F('references') - 1
+    )
+    if MediaFile.objects.filter(name=name, references=0).exists():
+        transaction.on_commit(lambda: discard(name))
+
+
+def recount(names):
+    """Выставляет счётчики ссылок на файлы names по числу постов с ними.
+
+    Нужен после вставки постов в обход сигналов, например bulk_create.
+    """
+    counts = dict(
+        Post.objects.filter(image__in=names).values_list('image').annotate(
+            total=Count('pk')
+        ).order_by()
+    )
+    MediaFile.objects.bulk_create(
+        [MediaFile(name=name) for name in counts], ignore_conflicts=True
+    )
+    MediaFile.objects.bulk_update(
+        [
+            MediaFile(name=name, references=total)
+            for name, total in counts.items()
+        ],
+        ['references']
+    )
+
+
+def discard(name):
+    """Удаляет файл и его миниатюры, если на него снова не сослались.
+
+    Запись без ссылок удаляется в одной транзакции с файлом, поэтому
+    retain() того же файла либо успевает поднять счётчик и файл
+    остаётся, либо ждёт, пока файл не удалят.
+    """
+    with transaction.atomic():
+        deleted, _ = MediaFile.objects.filter(
+            name=name, references=0
+        ).delete()
+        if not deleted and MediaFile.objects.filter(name=name).exists():
+            return
+        thumbnails.forget(name)
+        try:
+            delete_thumbnails(thumbnails.source(name), delete_file=False)
+            storage().delete(name)
+        except Exception:
+            logger.exception('Не удалось удалить картинку %s', name)
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+TOKENIZER = "tokenize = 'unicode61 remove_diacritics 2'"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_media_files'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            [
+                'CREATE VIRTUAL TABLE posts_post_search '
+                f'USING fts5(text, {TOKENIZER})',
+                'INSERT INTO posts_post_search (rowid, text) '
+                'SELECT id, text FROM posts_post',
+            ],
+            'DROP TABLE posts_post_search',
+        ),
+        migrations.RunSQL(
+            [
+                'CREATE VIRTUAL TABLE posts_comment_search '
+                f'USING fts5(text, {TOKENIZER})',
+                'INSERT INTO posts_comment_search (rowid, text) '
+                'SELECT id, text FROM posts_comment',
+            ],
+            'DROP TABLE posts_comment_search',
+        ),
+    ]
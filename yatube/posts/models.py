@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from core.storage import HashedFileSystemStorage
+
 
 User = get_user_model()
 
@@ -18,6 +20,27 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    CARD_FIELDS = (
+        'id',
+        'text',
+        'pub_date',
+        'image',
+        'updated',
+        'author__id',
+        'author__username',
+        'author__first_name',
+        'author__last_name',
+        'group__id',
+        'group__slug',
+        'group__title',
+    )
+
+    def for_cards(self):
+        """Посты с автором и группой одним запросом, только для карточек."""
+        return self.select_related('author', 'group').only(*self.CARD_FIELDS)
+
+
 class Post(models.Model):
     text = models.TextField('Текст', help_text='Введите текст поста')
     pub_date = models.DateTimeField(
@@ -42,13 +65,43 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=HashedFileSystemStorage(),
         blank=True
     )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+    )
+
+    objects = PostQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        post = super().from_db(db, field_names, values)
+        # Группа на момент загрузки: при переносе поста в другую группу
+        # нужно сбросить кеш страниц обеих групп.
+        post._loaded_group_id = post.__dict__.get('group_id')
+        post._loaded_image = post.__dict__.get('image')
+        return post
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='post_pub_date_idx',
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_pub_date_idx',
+            ),
+        ]
 
     def __str__(self) -> str:
         return f'Автор: {self.author.get_full_name}, Текст: {self.text[:20]}'
@@ -84,6 +137,12 @@ class Comment(models.Model):
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=('post', 'created'),
+                name='comment_post_created_idx',
+            ),
+        ]
 
 
 class Follow(models.Model):
@@ -110,3 +169,114 @@ class Follow(models.Model):
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='unique_follow',
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписчика."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    def __str__(self) -> str:
+        return f'{self.post_id} в ленте {self.user}'
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_timeline_entry',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date', '-post'),
+                name='timeline_user_pub_date_idx',
+            ),
+        ]
+
+
+class PulledAuthor(models.Model):
+    """Автор, чьи посты не раскладываются по лентам, а читаются на лету."""
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='pulled_feed',
+        verbose_name='Автор',
+    )
+
+    def __str__(self) -> str:
+        return str(self.author)
+
+    class Meta:
+        verbose_name = 'Популярный автор'
+        verbose_name_plural = 'Популярные авторы'
+
+
+class UserStats(models.Model):
+    """Денормализованные счётчики для шапки профиля."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    def __str__(self) -> str:
+        return f'Статистика {self.user}'
+
+    class Meta:
+        verbose_name = 'Статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
+
+
+class MediaFile(models.Model):
+    """Файл в хранилище картинок и число постов, которые на него ссылаются.
+
+    Одинаковые картинки хранятся одним файлом (см. HashedFileSystemStorage);
+    файл и его миниатюры удаляются, когда ссылок не остаётся.
+    """
+    name = models.CharField(
+        max_length=100,
+        primary_key=True,
+        verbose_name='Файл',
+    )
+    references = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Ссылок',
+    )
+
+    def __str__(self) -> str:
+        return f'{self.name} ({self.references})'
+
+    class Meta:
+        verbose_name = 'Медиафайл'
+        verbose_name_plural = 'Медиафайлы'
@@ -0,0 +1,215 @@
+import base64
+import binascii
+import heapq
+import json
+
+from django.core.paginator import Page, Paginator
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils.dateparse import parse_datetime
+
+from .models import PostQuerySet
+
+NEXT = 'next'
+PREVIOUS = 'prev'
+# До скольких строк считать точно; дальше число строк оценивается.
+COUNT_LIMIT = 10000
+
+
+def encode_cursor(post, direction, number):
+    """Упаковывает ключ поста (pub_date, id) в непрозрачный токен."""
+    payload = json.dumps({
+        'd': post.pub_date.isoformat(),
+        'i': post.id,
+        'r': direction,
+        'n': number,
+    }, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (pub_date, id, direction, number) или None."""
+    if not token:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(
+            token + '=' * (-len(token) % 4)
+        ))
+        pub_date = parse_datetime(payload['d'])
+        post_id = int(payload['i'])
+        direction = payload['r']
+        number = max(int(payload['n']), 1)
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        return None
+    if pub_date is None or direction not in (NEXT, PREVIOUS):
+        return None
+    return pub_date, post_id, direction, number
+
+
+def table_estimate(model, using):
+    """Примерное число строк в таблице модели без COUNT(*).
+
+    PostgreSQL хранит оценку в статистике таблицы; в остальных базах
+    берём наибольший первичный ключ - он не меньше числа строк и
+    читается из индекса.
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        return int(row[0]) if row else 0
+    return model._default_manager.using(using).aggregate(
+        estimate=Max('pk')
+    )['estimate'] or 0
+
+
+def estimated_count(queryset):
+    """Число строк queryset и признак того, что оно точное.
+
+    Строки считаются не дальше COUNT_LIMIT: если их больше, для
+    таблицы целиком возвращается оценка table_estimate(), а для
+    выборки с условиями - COUNT_LIMIT.
+    """
+    if not queryset.query.where:
+        estimate = table_estimate(queryset.model, queryset.db)
+        if estimate > COUNT_LIMIT:
+            return estimate, False
+    count = queryset.order_by()[:COUNT_LIMIT + 1].count()
+    if count > COUNT_LIMIT:
+        return COUNT_LIMIT, False
+    return count, True
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (pub_date, id) без COUNT(*) и OFFSET.
+
+    Страница выбирается условием по ключу последнего (или первого)
+    поста предыдущей страницы, поэтому глубокие страницы стоят
+    столько же, сколько первая.
+    """
+    cursor_mode = True
+    date_field = 'pub_date'
+    id_field = 'id'
+
+    def __init__(self, object_list, per_page):
+        super().__init__(
+            object_list.order_by(f'-{self.date_field}', f'-{self.id_field}'),
+            per_page
+        )
+
+    def to_posts(self, rows):
+        return rows
+
+    def fetch(self, limit, key=None, lookup='lt'):
+        """Возвращает до limit постов за ключом key в порядке обхода.
+
+        lookup='lt' идёт от новых постов к старым, 'gt' - обратно.
+        """
+        rows = self.object_list
+        if key is not None:
+            rows = rows.filter(self._key_filter(lookup, *key))
+        if lookup == 'gt':
+            rows = rows.reverse()
+        return self.to_posts(list(rows[:limit]))
+
+    def get_page(self, token):
+        cursor = decode_cursor(token)
+        if cursor is None:
+            return self._first_page()
+        pub_date, post_id, direction, number = cursor
+        if direction == NEXT:
+            posts = self.fetch(self.per_page + 1, (pub_date, post_id))
+            return self._build_page(
+                posts[:self.per_page], number, len(posts) > self.per_page
+            )
+        posts = self.fetch(self.per_page + 1, (pub_date, post_id), 'gt')
+        if len(posts) <= self.per_page:
+            return self._first_page()
+        return self._build_page(
+            posts[self.per_page - 1::-1], max(number, 2), True
+        )
+
+    def _key_filter(self, lookup, pub_date, post_id):
+        return (
+            Q(**{f'{self.date_field}__{lookup}': pub_date})
+            | Q(**{
+                self.date_field: pub_date,
+                f'{self.id_field}__{lookup}': post_id,
+            })
+        )
+
+    def _first_page(self):
+        posts = self.fetch(self.per_page + 1)
+        return self._build_page(
+            posts[:self.per_page], 1, len(posts) > self.per_page
+        )
+
+    def _build_page(self, posts, number, has_next):
+        # Page.has_next() и соседние методы опираются на num_pages,
+        # поэтому выставляем его без подсчёта строк.
+        self.num_pages = number + 1 if has_next else number
+        page = Page(posts, number, self)
+        page.next_cursor = (
+            encode_cursor(posts[-1], NEXT, number + 1)
+            if has_next else None
+        )
+        page.previous_cursor = (
+            encode_cursor(posts[0], PREVIOUS, number - 1)
+            if number > 1 and posts else None
+        )
+        return page
+
+
+class TimelinePaginator(CursorPaginator):
+    """Курсорный пагинатор по материализованной ленте читателя."""
+    id_field = 'post_id'
+
+    def __init__(self, entries, per_page):
+        super().__init__(
+            entries.select_related('post__author', 'post__group').only(
+                'pub_date',
+                'post_id',
+                *(f'post__{field}' for field in PostQuerySet.CARD_FIELDS)
+            ),
+            per_page
+        )
+
+    def to_posts(self, rows):
+        return [entry.post for entry in rows]
+
+
+class HybridTimelinePaginator(TimelinePaginator):
+    """Лента, в которую посты популярных авторов подмешиваются при чтении.
+
+    Записи из материализованной ленты и посты каждого такого автора
+    уже отсортированы по ключу, поэтому страница собирается слиянием
+    потоков через кучу, и из каждого потока читается не больше
+    одной страницы.
+    """
+
+    def __init__(self, entries, per_page, pulled_posts):
+        super().__init__(entries, per_page)
+        self.pulled = [
+            CursorPaginator(posts, per_page) for posts in pulled_posts
+        ]
+
+    def fetch(self, limit, key=None, lookup='lt'):
+        streams = [super().fetch(limit, key, lookup)] + [
+            paginator.fetch(limit, key, lookup) for paginator in self.pulled
+        ]
+        posts = []
+        for post in heapq.merge(
+            *streams,
+            key=lambda post: (post.pub_date, post.id),
+            reverse=lookup == 'lt'
+        ):
+            if posts and posts[-1].id == post.id:
+                continue
+            posts.append(post)
+            if len(posts) == limit:
+                break
+        return posts
@@ -0,0 +1,166 @@
+import re
+
+from django.db import connection
+
+from .models import Post
+
+POST_INDEX = 'posts_post_search'
+COMMENT_INDEX = 'posts_comment_search'
+# Совпадение в комментарии весит меньше, чем в тексте поста.
+COMMENT_WEIGHT = 0.5
+WORD = re.compile(r'\w+')
+
+RANKED_POSTS = f'''
+    SELECT post_id, MIN(rank) AS rank FROM (
+        SELECT rowid AS post_id, bm25({POST_INDEX}) AS rank
+        FROM {POST_INDEX} WHERE {POST_INDEX} MATCH %s
+        UNION ALL
+        SELECT comment.post_id, bm25({COMMENT_INDEX}) * {COMMENT_WEIGHT}
+        FROM {COMMENT_INDEX}
+        JOIN posts_comment AS comment ON comment.id = {COMMENT_INDEX}.rowid
+        WHERE {COMMENT_INDEX} MATCH %s
+    ) GROUP BY post_id
+'''
+
+
+def match_query(text):
+    """Запрос FTS5 из пользовательского ввода: все слова, по префиксу.
+
+    Синтаксис FTS5 (кавычки, NEAR, OR) из ввода не пропускается,
+    поэтому любой ввод даёт корректный запрос.
+    """
+    return ' '.join(f'"{word}"*' for word in WORD.findall(text.lower()))
+
+
+def _replace(index, rowid, text):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {index} WHERE rowid = %s', [rowid])
+        cursor.execute(
+            f'INSERT INTO {index} (rowid, text) VALUES (%s, %s)',
+            [rowid, text]
+        )
+
+
+def _remove(index, rowid):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {index} WHERE rowid = %s', [rowid])
+
+
+def _remove_many(index, rowids):
+    if not rowids:
+        return
+    placeholders = ', '.join(['%s'] * len(rowids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {index} WHERE rowid IN ({placeholders})',
+            list(rowids)
+        )
+
+
+def _replace_many(index, rows):
+    _remove_many(index, [rowid for rowid, _ in rows])
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {index} (rowid, text) VALUES (%s, %s)', rows
+        )
+
+
+def index_post(post):
+    _replace(POST_INDEX, post.id, post.text)
+
+
+def index_posts(posts):
+    _replace_many(POST_INDEX, [(post.id, post.text) for post in posts])
+
+
+def unindex_post(post):
+    _remove(POST_INDEX, post.id)
+
+
+def index_comment(comment):
+    _replace(COMMENT_INDEX, comment.id, comment.text)
+
+
+def index_comments(comments):
+    _replace_many(
+        COMMENT_INDEX, [(comment.id, comment.text) for comment in comments]
+    )
+
+
+def unindex_comment(comment):
+    _remove(COMMENT_INDEX, comment.id)
+
+
+def unindex_comments(comment_ids):
+    _remove_many(COMMENT_INDEX, comment_ids)
+
+
+def rebuild():
+    """Заново заполняет оба индекса по таблицам постов и комментариев."""
+    with connection.cursor() as cursor:
+        for index, table in (
+            (POST_INDEX, 'posts_post'),
+            (COMMENT_INDEX, 'posts_comment'),
+        ):
+            cursor.execute(f'DELETE FROM {index}')
+            cursor.execute(
+                f'INSERT INTO {index} (rowid, text) '
+                f'SELECT id, text FROM {table}'
+            )
+            cursor.execute(
+                f"INSERT INTO {index} ({index}) VALUES ('optimize')"
+            )
+
+
+def matching(queryset, text, index=POST_INDEX):
+    """Сужает queryset до строк, чей текст найден в индексе index."""
+    query = match_query(text)
+    if not query:
+        return queryset.none()
+    # RawSQL в pk__in оборачивается в скобки дважды, и SQLite считает
+    # подзапрос скалярным, поэтому условие задаётся через extra().
+    table = queryset.model._meta.db_table
+    return queryset.extra(
+        where=[
+            f'"{table}"."id" IN '
+            f'(SELECT rowid FROM {index} WHERE {index} MATCH %s)'
+        ],
+        params=[query],
+    )
+
+
+class SearchResults:
+    """Посты, найденные по тексту поста или комментариев, по релевантности.
+
+    Поддерживает count() и срезы, поэтому подходит для Paginator:
+    каждая страница - один запрос к индексу и один за карточками.
+    """
+
+    def __init__(self, text):
+        self.query = match_query(text)
+
+    def count(self):
+        if not self.query:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM ({RANKED_POSTS})',
+                [self.query, self.query]
+            )
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, page):
+        if not self.query:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'{RANKED_POSTS} ORDER BY rank, post_id DESC '
+                'LIMIT %s OFFSET %s',
+                [self.query, self.query, page.stop - page.start, page.start]
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = Post.objects.for_cards().in_bulk(ids)
+        return [posts[post_id] for post_id in ids if post_id in posts]
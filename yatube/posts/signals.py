@@ -0,0 +1,137 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cache, media, search, stats, thumbnails, timeline
+from .models import Comment, Follow, Group, Post, User
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, update_fields=None,
+               **kwargs):
+    if raw:
+        return
+    if created:
+        stats.user_added(instance)
+    elif update_fields is None or set(update_fields) != {'last_login'}:
+        cache.bump_feed_generation()
+        cache.bump_cards_generation()
+        cache.touch_all_pages()
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.post_added(instance)
+        timeline.push_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    stats.post_removed(instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def feed_changed(sender, raw=False, **kwargs):
+    if not raw:
+        cache.bump_feed_generation()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        cache.touch_post_pages(instance, {
+            instance.group_id,
+            getattr(instance, '_loaded_group_id', None),
+        })
+
+
+@receiver(pre_save, sender=Post)
+def image_uploading(sender, instance, raw=False, **kwargs):
+    # Ссылка учитывается до записи файла, иначе отложенный discard()
+    # мог бы удалить уже существующий файл с тем же содержимым.
+    if not raw:
+        instance._retained_image = media.retain_upload(instance)
+
+
+@receiver(post_save, sender=Post)
+def image_saved(sender, instance, raw=False, **kwargs):
+    name = instance.image.name or None
+    loaded = getattr(instance, '_loaded_image', None) or None
+    retained = getattr(instance, '_retained_image', None)
+    instance._retained_image = None
+    if retained and (name == loaded or name != retained):
+        # Пост уже ссылался на этот файл, лишнюю ссылку снимаем.
+        media.release(retained)
+        retained = None
+    if raw or name == loaded:
+        return
+    if name:
+        if not retained:
+            media.retain(name)
+        thumbnails.schedule(instance)
+    if loaded:
+        media.release(loaded)
+    instance._loaded_image = name
+
+
+@receiver(post_delete, sender=Post)
+def image_deleted(sender, instance, **kwargs):
+    if instance.image.name:
+        media.release(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+def post_indexed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_unindexed(sender, instance, **kwargs):
+    search.unindex_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_indexed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_unindexed(sender, instance, **kwargs):
+    search.unindex_comment(instance)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, raw=False, **kwargs):
+    if not raw:
+        cache.bump_cards_generation()
+        cache.touch_all_pages()
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, raw=False, **kwargs):
+    if not raw and instance.post_id:
+        cache.touch_comment_pages(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.user_id and instance.author_id:
+        stats.follow_added(instance)
+        timeline.backfill(instance)
+        cache.touch_follow_pages(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    if instance.user_id and instance.author_id:
+        stats.follow_removed(instance)
+        timeline.prune(instance)
+        cache.touch_follow_pages(instance)
@@ -0,0 +1,59 @@
+from django.db.models import F
+
+from .models import Follow, Post, UserStats
+
+
+def bump(user_id, **deltas):
+    """Сдвигает счётчики пользователя, если запись уже заведена.
+
+    Отсутствующая запись создаётся при первом чтении через get_stats,
+    поэтому здесь её не создаём.
+    """
+    UserStats.objects.filter(user_id=user_id).update(**{
+        field: F(field) + delta for field, delta in deltas.items()
+    })
+
+
+def count(user_id):
+    return {
+        'posts_count': Post.objects.filter(author_id=user_id).count(),
+        'followers_count': Follow.objects.filter(author_id=user_id).count(),
+        'following_count': Follow.objects.filter(user_id=user_id).count(),
+    }
+
+
+def recount(user_id):
+    stats, _ = UserStats.objects.update_or_create(
+        user_id=user_id,
+        defaults=count(user_id),
+    )
+    return stats
+
+
+def get_stats(user_id):
+    try:
+        return UserStats.objects.get(user_id=user_id)
+    except UserStats.DoesNotExist:
+        return recount(user_id)
+
+
+def user_added(user):
+    UserStats.objects.create(user=user)
+
+
+def post_added(post):
+    bump(post.author_id, posts_count=1)
+
+
+def post_removed(post):
+    bump(post.author_id, posts_count=-1)
+
+
+def follow_added(follow):
+    bump(follow.author_id, followers_count=1)
+    bump(follow.user_id, following_count=1)
+
+
+def follow_removed(follow):
+    bump(follow.author_id, followers_count=-1)
+    bump(follow.user_id, following_count=-1)
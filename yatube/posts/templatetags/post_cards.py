@@ -0,0 +1,65 @@
+import logging
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .. import thumbnails
+from ..cache import card_key, cards_generation
+
+logger = logging.getLogger(__name__)
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts, group_list=False):
+    """Пары (пост, html карточки); кеш читается одним get_many.
+
+    Карточки в лентах не зависят от читателя, поэтому общий ключ
+    состоит из id поста, времени его изменения и вида ленты.
+    """
+    generation = cards_generation()
+    variant = 'group' if group_list else 'feed'
+    keys = [card_key(post, generation, variant) for post in posts]
+    cards = cache.get_many(keys)
+    missing = {}
+    pending = [
+        (key, post) for key, post in zip(keys, posts) if key not in cards
+    ]
+    if pending:
+        resolved = thumbnails.resolve(
+            [post.image for key, post in pending], 'card'
+        )
+    for key, post in pending:
+        missing[key] = render_to_string(
+            'posts/includes/post_card.html',
+            {
+                'post': post,
+                'group_list': group_list,
+                'thumbnail': resolved.get(post.image.name),
+            },
+            request=context.get('request'),
+        )
+    if missing:
+        cache.set_many(missing, settings.CARD_CACHE_TIMEOUT)
+        cards.update(missing)
+    return [(post, mark_safe(cards[key])) for key, post in zip(keys, posts)]
+
+
+@register.simple_tag
+def post_thumbnail(image, size):
+    """Миниатюра картинки поста размера size (posts.thumbnails.Thumbnail).
+
+    Обычно миниатюры уже созданы в фоне после сохранения поста.
+    В лентах их заранее получает post_cards, и тег не нужен.
+    """
+    if not image:
+        return None
+    try:
+        return thumbnails.thumbnail(image, size)
+    except Exception:
+        logger.exception('Не удалось получить миниатюру %s', image)
+        return None
@@ -0,0 +1,347 @@
+from unittest import mock
+
+from django.contrib.admin.sites import site
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import admin, bulk, models, pagination, search
+
+ADMIN_USERNAME = 'TestAdmin'
+CHANGELIST_URL = reverse('admin:posts_post_changelist')
+PER_PAGE = 3
+
+
+class PostChangeListTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = models.User.objects.create_user(
+            username=ADMIN_USERNAME,
+            is_staff=True,
+            is_superuser=True,
+        )
+        cls.group = models.Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = models.Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            models.Post.objects.create(
+                text=f'{index} ' + 'Длинный текст поста. ' * 20,
+                author=cls.admin,
+                group=cls.group,
+            )
+            for index in range(PER_PAGE * 2 + 1)
+        ]
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+        patcher = mock.patch.object(
+            site._registry[models.Post], 'list_per_page', PER_PAGE
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def changelist_queries(self, query=''):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(CHANGELIST_URL + query)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_queries_do_not_grow_with_rows(self):
+        """Число запросов списка не зависит от числа строк и групп."""
+        _, before = self.changelist_queries()
+        for post in self.posts[:PER_PAGE]:
+            post.group = None
+            post.save()
+        models.Group.objects.create(
+            title='Третья группа',
+            slug='third-slug',
+            description='Тестовое описание',
+        )
+        _, after = self.changelist_queries()
+        self.assertEqual(after, before)
+
+    def test_text_is_truncated(self):
+        """В списке показано только начало текста поста."""
+        response, _ = self.changelist_queries()
+        post = response.context['cl'].result_list[0]
+        self.assertEqual(
+            admin.PostAdmin.text_preview(None, post),
+            self.posts[-1].text[:admin.TEXT_PREVIEW_LENGTH - 1] + '…'
+        )
+        self.assertNotContains(response, self.posts[-1].text)
+
+    def test_keyset_pages(self):
+        """Страницы списка идут по ключу и вместе покрывают все посты."""
+        seen = []
+        query = ''
+        while query is not None:
+            response, _ = self.changelist_queries(query)
+            changelist = response.context['cl']
+            seen.extend(post.pk for post in changelist.result_list)
+            query = changelist.next_url
+        self.assertEqual(seen, [post.pk for post in reversed(self.posts)])
+
+    def test_count_is_estimated_on_large_tables(self):
+        """Большую таблицу список не пересчитывает, а оценивает."""
+        with mock.patch.object(pagination, 'COUNT_LIMIT', PER_PAGE):
+            response, _ = self.changelist_queries()
+        changelist = response.context['cl']
+        self.assertFalse(changelist.result_count_exact)
+        self.assertEqual(changelist.result_count, self.posts[-1].pk)
+        self.assertContains(response, f'около {self.posts[-1].pk}')
+
+    def test_group_editor(self):
+        """Группу поста можно сменить прямо из списка."""
+        response, _ = self.changelist_queries()
+        formset = response.context['cl'].formset
+        data = {
+            f'form-{key}': value
+            for key, value in formset.management_form.initial.items()
+        }
+        for index, form in enumerate(formset.forms):
+            data[f'form-{index}-id'] = form.instance.pk
+            data[f'form-{index}-group'] = self.other_group.pk
+        data['_save'] = 'Сохранить'
+        self.client.post(CHANGELIST_URL, data)
+        moved = {form.instance.pk for form in formset.forms}
+        self.assertEqual(
+            set(models.Post.objects.filter(
+                group=self.other_group
+            ).values_list('pk', flat=True)),
+            moved
+        )
+
+
+class AutocompleteAdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = models.User.objects.create_user(
+            username=ADMIN_USERNAME,
+            is_staff=True,
+            is_superuser=True,
+        )
+        cls.users = [
+            models.User.objects.create_user(username=f'Пользователь{index}')
+            for index in range(3)
+        ]
+        cls.post = models.Post.objects.create(
+            text='Тестовый текст',
+            author=cls.admin,
+        )
+        for user in cls.users:
+            models.Follow.objects.create(user=user, author=cls.admin)
+            models.Comment.objects.create(
+                post=cls.post,
+                author=user,
+                text='Тестовый комментарий',
+            )
+        cls.comment = models.Comment.objects.first()
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def test_filters_do_not_list_all_users(self):
+        """Фильтры списка подписок выводят только выбранного автора."""
+        response = self.client.get(
+            reverse('admin:posts_follow_changelist'),
+            {'user__id__exact': self.users[0].pk},
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list),
+            list(models.Follow.objects.filter(user=self.users[0]))
+        )
+        self.assertContains(
+            response, f'<option value="{self.users[0].pk}" selected>'
+        )
+        for user in self.users[1:]:
+            self.assertNotContains(response, f'<option value="{user.pk}"')
+
+    def test_change_form_does_not_list_all_rows(self):
+        """В форме комментария выбраны только его пост и автор."""
+        response = self.client.get(reverse(
+            'admin:posts_comment_change', args=[self.comment.pk]
+        ))
+        self.assertContains(response, 'admin-autocomplete')
+        for user in self.users:
+            if user != self.comment.author:
+                self.assertNotContains(
+                    response, f'<option value="{user.pk}"'
+                )
+
+    def test_lookups_are_paged(self):
+        """Варианты для autocomplete приходят страницами в JSON."""
+        response = self.client.get(
+            reverse('admin:auth_user_autocomplete'),
+            {'term': 'Пользователь'},
+        )
+        data = response.json()
+        self.assertEqual(len(data['results']), len(self.users))
+        self.assertFalse(data['pagination']['more'])
+
+    def test_comment_list_queries_do_not_grow_with_rows(self):
+        """Список комментариев не догружает посты и авторов по строкам."""
+        url = reverse('admin:posts_comment_changelist')
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(url)
+        models.Comment.objects.create(
+            post=models.Post.objects.create(
+                text='Другой пост',
+                author=self.users[0],
+            ),
+            author=self.users[1],
+            text='Ещё комментарий',
+        )
+        with CaptureQueriesContext(connection) as after:
+            response = self.client.get(url)
+        self.assertContains(response, f'#{self.post.pk} Тестовый текст')
+        self.assertEqual(len(after), len(before))
+
+
+@override_settings(BULK_ACTION_BATCH_SIZE=2)
+class BulkActionTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = models.User.objects.create_user(
+            username=ADMIN_USERNAME,
+            is_staff=True,
+            is_superuser=True,
+        )
+        cls.group = models.Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            models.Post.objects.create(
+                text=f'Тестовый текст {index}',
+                author=cls.admin,
+            )
+            for index in range(5)
+        ]
+        cls.comments = [
+            models.Comment.objects.create(
+                post=cls.posts[0],
+                author=cls.admin,
+                text=f'Спам номер {index}',
+            )
+            for index in range(5)
+        ]
+        cls.kept = models.Comment.objects.create(
+            post=cls.posts[0],
+            author=cls.admin,
+            text='Полезный комментарий',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def run_action(self, url, action, objects, **data):
+        if 'post' not in data:
+            # Так отправляет форму действий страница списка.
+            data['index'] = 0
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {
+                'action': action,
+                admin.ACTION_CHECKBOX_NAME: [item.pk for item in objects],
+                **data,
+            }, follow=True)
+        return response, queries
+
+    def test_move_posts_in_batches(self):
+        """Посты переносятся пачками UPDATE, кеш группы сбрасывается."""
+        group_url = reverse('posts:group_list', args=[self.group.slug])
+        self.assertEqual(
+            len(self.guest.get(group_url).context['page_obj']), 0
+        )
+        response, queries = self.run_action(
+            reverse('admin:posts_post_changelist'),
+            'move_to_group',
+            self.posts,
+            group=self.group.pk,
+        )
+        updates = [
+            query for query in queries
+            if query['sql'].startswith('UPDATE "posts_post"')
+        ]
+        self.assertEqual(len(updates), 3)
+        self.assertContains(response, 'обработано 5 из 5')
+        self.assertEqual(
+            models.Post.objects.filter(group=self.group).count(), 5
+        )
+        self.assertEqual(
+            len(self.guest.get(group_url).context['page_obj']), 5
+        )
+
+    def test_interrupted_move_refreshes_pages(self):
+        """Прерванный перенос всё равно сбрасывает кеш страниц группы."""
+        group_url = reverse('posts:group_list', args=[self.group.slug])
+        self.guest.get(group_url)
+
+        def fail(count):
+            raise RuntimeError
+
+        with self.assertRaises(RuntimeError):
+            bulk.move_posts(models.Post.objects.all(), self.group.pk, fail)
+        self.assertEqual(
+            len(self.guest.get(group_url).context['page_obj']), 2
+        )
+
+    def test_delete_comments_in_batches(self):
+        """Комментарии удаляются после подтверждения пачками DELETE."""
+        post_url = reverse('posts:post_detail', args=[self.posts[0].pk])
+        self.assertContains(self.guest.get(post_url), 'Спам номер')
+        url = reverse('admin:posts_comment_changelist')
+        response, _ = self.run_action(
+            url, 'delete_in_batches', self.comments
+        )
+        self.assertContains(response, 'Будет удалено объектов: 5')
+        self.assertEqual(models.Comment.objects.count(), 6)
+        response, queries = self.run_action(
+            url, 'delete_in_batches', self.comments, post='yes'
+        )
+        deletes = [
+            query for query in queries
+            if query['sql'].startswith('DELETE FROM "posts_comment"')
+        ]
+        self.assertEqual(len(deletes), 3)
+        self.assertEqual(list(models.Comment.objects.all()), [self.kept])
+        self.assertFalse(search.matching(
+            models.Comment.objects.all(), 'спам', search.COMMENT_INDEX
+        ).exists())
+        self.assertNotContains(self.guest.get(post_url), 'Спам номер')
+
+    @override_settings(BULK_ACTION_BACKGROUND_THRESHOLD=1)
+    def test_large_selection_runs_in_background(self):
+        """Большая выборка уходит в фон, ход виден на отдельной странице."""
+        with mock.patch('django.db.transaction.on_commit') as on_commit:
+            response, _ = self.run_action(
+                reverse('admin:posts_post_changelist'),
+                'move_to_group',
+                self.posts,
+                group=self.group.pk,
+            )
+        message = str(list(response.context['messages'])[0])
+        self.assertIn('обрабатываются в фоне', message)
+        job_url = message.split('href="')[1].split('"')[0]
+        self.assertEqual(self.client.get(job_url).context['job']['done'], 0)
+        on_commit.call_args[0][0]()
+        response = self.client.get(job_url)
+        self.assertEqual(response.context['job']['done'], 5)
+        self.assertContains(response, 'Готово.')
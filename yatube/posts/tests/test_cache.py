@@ -1,14 +1,18 @@
+from unittest import mock
+
 from django.core.cache import cache
 from django.test import Client, TestCase
 from django.urls import reverse
 
 from .. import models
+from ..templatetags import post_cards
 
 SLUG = 'test-slug'
 TEXT = 'Тестовый текст'
 AUTHOR_USERNAME = 'TestAuthor'
 POST_TEXT = 'Тестовый текст'
 INDEX_URL = reverse('posts:index')
+PROFILE_URL = reverse('posts:profile', args=[AUTHOR_USERNAME])
 
 
 class CacheTests(TestCase):
@@ -23,14 +27,89 @@ class CacheTests(TestCase):
         cls.author_client = Client()
 
     def setUp(self):
+        cache.clear()
         self.guest = Client()
 
     def test_index_page_cache_contents_post_list(self):
         """Посты главной страницы сохраняются в кеш."""
-        content_before_delete = self.guest.get(INDEX_URL).content
-        models.Post.objects.all().delete()
-        content_after_delete = self.guest.get(INDEX_URL).content
-        self.assertEqual(content_before_delete, content_after_delete)
+        content_before_update = self.guest.get(INDEX_URL).content
+        models.Post.objects.update(text='Изменён в обход сигналов')
+        content_after_update = self.guest.get(INDEX_URL).content
+        self.assertEqual(content_before_update, content_after_update)
         cache.clear()
         content_after_clear = self.guest.get(INDEX_URL).content
-        self.assertNotEqual(content_after_delete, content_after_clear)
+        self.assertNotEqual(content_after_update, content_after_clear)
+
+    def test_index_page_cache_is_invalidated_by_changes(self):
+        """Создание, правка и удаление поста сразу видны на главной."""
+        content = self.guest.get(INDEX_URL).content
+        new_post = models.Post.objects.create(
+            text='Новый пост',
+            author=self.author,
+        )
+        self.assertIn('Новый пост', self.guest.get(INDEX_URL).content.decode())
+        new_post.text = 'Исправленный пост'
+        new_post.save()
+        self.assertIn(
+            'Исправленный пост',
+            self.guest.get(INDEX_URL).content.decode()
+        )
+        new_post.delete()
+        self.assertEqual(self.guest.get(INDEX_URL).content, content)
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = models.User.objects.create_user(username=AUTHOR_USERNAME)
+        cls.group = models.Group.objects.create(
+            title='Тестовая группа',
+            slug=SLUG,
+            description='Тестовое описание',
+        )
+        cls.post = models.Post.objects.create(
+            text=POST_TEXT,
+            author=cls.author,
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+
+    def test_card_is_shared_between_feeds(self):
+        """Карточка, отрисованная на главной, берётся из кеша в профиле."""
+        self.guest.get(INDEX_URL)
+        models.Post.objects.update(text='Изменён в обход сигналов')
+        content = self.guest.get(PROFILE_URL).content.decode()
+        self.assertIn(POST_TEXT, content)
+
+    def test_card_is_rerendered_after_changes(self):
+        """Правка поста и переименование группы обновляют карточку."""
+        self.guest.get(PROFILE_URL)
+        self.post.text = 'Исправленный текст'
+        self.post.save()
+        self.assertIn(
+            'Исправленный текст',
+            self.guest.get(PROFILE_URL).content.decode()
+        )
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertIn(
+            'Новое название',
+            self.guest.get(PROFILE_URL).content.decode()
+        )
+
+    def test_cards_are_read_with_one_get_many(self):
+        """Карточки страницы читаются из кеша одним get_many."""
+        models.Post.objects.create(text=POST_TEXT, author=self.author)
+        self.guest.get(PROFILE_URL)
+        with mock.patch.object(
+            post_cards.cache, 'get_many', wraps=post_cards.cache.get_many
+        ) as get_many, mock.patch.object(
+            post_cards.cache, 'set_many'
+        ) as set_many:
+            self.guest.get(PROFILE_URL)
+        get_many.assert_called_once()
+        set_many.assert_not_called()
@@ -0,0 +1,94 @@
+import os
+import tempfile
+import threading
+
+from django.test import SimpleTestCase
+
+from core.cache_backends import SQLiteCache
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.location = os.path.join(directory.name, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_values_are_shared_between_instances(self):
+        """Запись видна другому экземпляру с тем же файлом."""
+        self.cache.set('key', {'value': 1})
+        other = self.make_cache()
+        self.assertEqual(other.get('key'), {'value': 1})
+        other.clear()
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_get_many_and_set_many(self):
+        """Пакетные чтение и запись работают одним вызовом."""
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'missing']),
+            {'a': 1, 'b': 2}
+        )
+
+    def test_expired_values_are_not_returned(self):
+        """Просроченная запись не возвращается и может быть добавлена."""
+        self.cache.set('key', 'old', timeout=-1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+        self.assertFalse(self.cache.add('key', 'newer'))
+        self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_incr_is_atomic(self):
+        """incr из нескольких потоков не теряет приращений."""
+        self.cache.set('counter', 0)
+
+        def work():
+            for _ in range(50):
+                self.cache.incr('counter')
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_least_recently_used_entries_are_evicted(self):
+        """При переполнении вытесняются давно не читанные записи."""
+        cache = self.make_cache(
+            MAX_ENTRIES=3, CULL_FREQUENCY=3, CULL_EVERY=1, TOUCH_INTERVAL=0
+        )
+        cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        cache.get('a')
+        cache.set('d', 4)
+        self.assertEqual(cache.get_many(['a', 'b', 'c', 'd']), {
+            'a': 1, 'd': 4
+        })
+
+    def test_zero_cull_frequency_clears_cache(self):
+        """CULL_FREQUENCY = 0, как в Django, очищает кеш целиком."""
+        cache = self.make_cache(MAX_ENTRIES=3, CULL_FREQUENCY=0, CULL_EVERY=1)
+        cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        cache.set('d', 4)
+        self.assertEqual(cache.get_many(['a', 'b', 'c', 'd']), {})
+
+    def test_reads_do_not_take_write_lock(self):
+        """Чтение не пишет в базу, переполнение проверяется реже."""
+        cache = self.make_cache(MAX_ENTRIES=1, CULL_EVERY=3)
+        cache.set('a', 1)
+        statements = []
+        cache.connection.set_trace_callback(statements.append)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertFalse([
+            sql for sql in statements
+            if not sql.lstrip().upper().startswith('SELECT')
+        ])
+        cache.set('b', 2)
+        self.assertEqual(len(cache.get_many(['a', 'b'])), 2)
+        cache.set('c', 3)
+        self.assertEqual(len(cache.get_many(['a', 'b', 'c'])), 1)
@@ -0,0 +1,80 @@
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from .. import images
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+ORIENTATION = 0x0112
+ROTATED_90 = 6
+MAKE = 0x010F
+GPS_INFO = 0x8825
+
+
+def make_jpeg(size, orientation=None):
+    exif = Image.Exif()
+    if orientation:
+        exif[ORIENTATION] = orientation
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'JPEG', exif=exif)
+    return ContentFile(buffer.getvalue())
+
+
+def make_png_with_location():
+    exif = Image.Exif()
+    exif[MAKE] = 'Camera'
+    exif[GPS_INFO] = {1: 'N', 2: (55.0, 45.0, 0.0)}
+    buffer = io.BytesIO()
+    Image.new('RGB', (50, 50), 'red').save(buffer, 'PNG', exif=exif)
+    return ContentFile(buffer.getvalue())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_IMAGE_MAX_SIZE=100)
+class NormalizeTests(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def open(self, name):
+        with default_storage.open(name) as file:
+            image = Image.open(file)
+            image.load()
+        return image
+
+    def test_large_image_is_downscaled_and_stripped(self):
+        """Большая картинка ужимается, поворачивается и теряет EXIF."""
+        name = default_storage.save(
+            'posts/photo.jpg',
+            make_jpeg((400, 200), orientation=ROTATED_90)
+        )
+        self.assertEqual(images.normalize(name), name)
+        image = self.open(name)
+        self.assertEqual(image.size, (50, 100))
+        self.assertEqual(len(image.getexif()), 0)
+
+    def test_small_clean_image_is_left_alone(self):
+        """Маленькая картинка без EXIF не перекодируется."""
+        content = make_jpeg((50, 50))
+        name = default_storage.save('posts/small.jpg', content)
+        images.normalize(name)
+        content.seek(0)
+        with default_storage.open(name) as file:
+            self.assertEqual(file.read(), content.read())
+
+    def test_png_loses_location(self):
+        """Из PNG удаляются EXIF с координатами."""
+        content = make_png_with_location()
+        with Image.open(content) as original:
+            self.assertIn(GPS_INFO, original.getexif())
+        name = default_storage.save('posts/photo.png', content)
+        images.normalize(name)
+        image = self.open(name)
+        self.assertEqual(len(image.getexif()), 0)
+        self.assertNotIn('exif', image.info)
@@ -0,0 +1,89 @@
+import re
+
+from django.test import TestCase
+
+from .. import models
+from ..pagination import CursorPaginator, TimelinePaginator
+
+PER_PAGE = 10
+
+
+class FeedIndexTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = models.User.objects.create_user(username='TestAuthor')
+        cls.reader = models.User.objects.create_user(username='TestReader')
+        cls.group = models.Group.objects.create(
+            title='Тестовый заголовок',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        models.Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = models.Post.objects.create(
+            text='Тестовый текст',
+            author=cls.author,
+            group=cls.group,
+        )
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(index, plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+        # SQLite до 3.36 пишет SCAN TABLE, новее - просто SCAN; обход
+        # таблицы по индексу (USING INDEX) полным сканом не считается.
+        self.assertIsNone(
+            re.search(r'SCAN (TABLE )?posts_post\b(?! USING)', plan)
+        )
+
+    def feed_querysets(self, paginator):
+        after = paginator._key_filter(
+            'lt',
+            self.post.pub_date,
+            self.post.id
+        )
+        return [
+            paginator.object_list[:PER_PAGE + 1],
+            paginator.object_list.filter(after)[:PER_PAGE + 1],
+        ]
+
+    def test_feeds_use_composite_indexes(self):
+        """Ленты читаются по составным индексам без сортировки."""
+        cases = [
+            [
+                CursorPaginator(models.Post.objects.for_cards(), PER_PAGE),
+                'post_pub_date_idx',
+            ],
+            [
+                CursorPaginator(self.author.posts.for_cards(), PER_PAGE),
+                'post_author_pub_date_idx',
+            ],
+            [
+                CursorPaginator(self.group.posts.for_cards(), PER_PAGE),
+                'post_group_pub_date_idx',
+            ],
+            [
+                TimelinePaginator(self.reader.timeline.all(), PER_PAGE),
+                'timeline_user_pub_date_idx',
+            ],
+        ]
+        for paginator, index in cases:
+            for queryset in self.feed_querysets(paginator):
+                with self.subTest(index=index, sql=str(queryset.query)):
+                    self.assertUsesIndex(queryset, index)
+
+    def test_comments_use_post_created_index(self):
+        """Комментарии поста читаются по индексу (post, created)."""
+        self.assertUsesIndex(
+            self.post.comments.select_related('author').order_by('created'),
+            'comment_post_created_idx'
+        )
+
+    def test_follow_lookup_uses_unique_index(self):
+        """Проверка подписки идёт по уникальному индексу."""
+        plan = models.Follow.objects.filter(
+            user=self.reader,
+            author=self.author
+        ).explain()
+        self.assertIn('INDEX', plan)
+        self.assertIn('user_id=? AND author_id=?', plan)
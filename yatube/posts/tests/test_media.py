@@ -0,0 +1,176 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.models import KVStore
+
+from .. import media, models, thumbnails
+
+AUTHOR_USERNAME = 'TestAuthor'
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class DeduplicatedMediaTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = models.User.objects.create_user(username=AUTHOR_USERNAME)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        on_commit = mock.patch(
+            'django.db.transaction.on_commit',
+            side_effect=lambda func: func()
+        )
+        on_commit.start()
+        self.addCleanup(on_commit.stop)
+        process = mock.patch('posts.thumbnails.process')
+        process.start()
+        self.addCleanup(process.stop)
+
+    def create_post(self, filename):
+        return models.Post.objects.create(
+            text='Пост с картинкой',
+            author=self.author,
+            image=SimpleUploadedFile(filename, SMALL_GIF, 'image/gif'),
+        )
+
+    def test_identical_uploads_share_one_file(self):
+        """Одинаковые картинки хранятся одним файлом с числом ссылок."""
+        first = self.create_post('first.gif')
+        second = self.create_post('second.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(
+            models.MediaFile.objects.get(name=first.image.name).references,
+            2
+        )
+
+    def test_file_is_deleted_with_last_reference(self):
+        """Файл удаляется, когда на него не ссылается ни один пост."""
+        first = self.create_post('first.gif')
+        second = self.create_post('second.gif')
+        name = first.image.name
+        first.delete()
+        self.assertTrue(media.storage().exists(name))
+        second.delete()
+        self.assertFalse(media.storage().exists(name))
+        self.assertFalse(models.MediaFile.objects.filter(name=name).exists())
+
+    def test_file_referenced_again_is_kept(self):
+        """Файл не удаляется, если на него сослались до удаления."""
+        name = self.create_post('first.gif').image.name
+        models.MediaFile.objects.filter(name=name).update(references=0)
+        media.retain(name)
+        media.discard(name)
+        self.assertTrue(media.storage().exists(name))
+        self.assertEqual(
+            models.MediaFile.objects.get(name=name).references, 1
+        )
+
+    def test_discard_racing_identical_upload_keeps_file(self):
+        """Отложенное удаление не стирает файл, найденный новой загрузкой."""
+        name = self.create_post('first.gif').image.name
+        pending = []
+        with mock.patch(
+            'django.db.transaction.on_commit', side_effect=pending.append
+        ):
+            models.Post.objects.get().delete()
+        discard = pending.pop()
+        storage = media.storage()
+        save = storage.save
+
+        def save_then_discard(*args, **kwargs):
+            saved = save(*args, **kwargs)
+            discard()
+            return saved
+
+        with mock.patch.object(storage, 'save', save_then_discard):
+            post = self.create_post('second.gif')
+        self.assertEqual(post.image.name, name)
+        self.assertTrue(storage.exists(name))
+        self.assertEqual(
+            models.MediaFile.objects.get(name=name).references, 1
+        )
+
+    def test_reuploading_same_image_keeps_count(self):
+        """Повторная загрузка той же картинки в пост не плодит ссылок."""
+        post = self.create_post('first.gif')
+        post.image = SimpleUploadedFile('again.gif', SMALL_GIF, 'image/gif')
+        post.save()
+        self.assertEqual(
+            models.MediaFile.objects.get(name=post.image.name).references,
+            1
+        )
+
+    def test_collect_media_removes_only_orphans(self):
+        """Сборщик удаляет только файлы, на которые нет ссылок."""
+        post = self.create_post('first.gif')
+        storage = media.storage()
+        orphan = storage.replace('posts/orphan.gif', ContentFile(SMALL_GIF))
+        stale_thumbnail = default.storage.save(
+            'cache/ab/stale.jpg', ContentFile(SMALL_GIF)
+        )
+        out = StringIO()
+        call_command('collect_media', '--dry-run', '--min-age=0', stdout=out)
+        self.assertIn('Будет удалено файлов: 2', out.getvalue())
+        self.assertTrue(storage.exists(orphan))
+        call_command('collect_media', '--min-age=0', stdout=StringIO())
+        self.assertFalse(storage.exists(orphan))
+        self.assertFalse(default.storage.exists(stale_thumbnail))
+        self.assertTrue(storage.exists(post.image.name))
+
+    def test_collect_media_removes_orphaned_thumbnails(self):
+        """Сборщик удаляет миниатюры и записи sorl удалённых картинок."""
+        kept = self.create_post('first.gif')
+        thumbnails.generate(kept.image.name)
+        kept_thumbnail = get_thumbnail(kept.image, '10x10')
+        post = models.Post.objects.create(
+            text='Пост с другой картинкой',
+            author=self.author,
+            image=SimpleUploadedFile('other.gif', SMALL_GIF + b'\0'),
+        )
+        # Миниатюра под ключом default_storage, как до исправления ключей.
+        orphan = get_thumbnail(post.image.name, '10x10')
+        post.delete()
+        self.assertTrue(default.storage.exists(orphan.name))
+        out = StringIO()
+        call_command(
+            'collect_media', '--dry-run', '--min-age=0', '-v', '2',
+            stdout=out
+        )
+        self.assertIn(orphan.name, out.getvalue())
+        self.assertNotIn(kept_thumbnail.name, out.getvalue())
+        call_command(
+            'collect_media', '--min-age=0', '--batch-size=1',
+            stdout=StringIO()
+        )
+        self.assertFalse(default.storage.exists(orphan.name))
+        self.assertTrue(default.storage.exists(kept_thumbnail.name))
+        self.assertIsNotNone(default.kvstore.get(kept_thumbnail))
+        self.assertFalse(
+            KVStore.objects.filter(key__contains=orphan.key).exists()
+        )
+        out = StringIO()
+        call_command('collect_media', '--min-age=0', stdout=out)
+        self.assertIn('Удалено файлов: 0', out.getvalue())
+        self.assertIn('Удалено наборов миниатюр: 0', out.getvalue())
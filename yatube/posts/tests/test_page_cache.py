@@ -0,0 +1,111 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import http_date
+
+from .. import models
+
+AUTHOR_USERNAME = 'TestAuthor'
+ANOTHER_AUTHOR_USERNAME = 'TestAnotherAuthor'
+INDEX_URL = reverse('posts:index')
+PROFILE_URL = reverse('posts:profile', args=[AUTHOR_USERNAME])
+ANOTHER_PROFILE_URL = reverse(
+    'posts:profile',
+    args=[ANOTHER_AUTHOR_USERNAME]
+)
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = models.User.objects.create_user(username=AUTHOR_USERNAME)
+        cls.another_author = models.User.objects.create_user(
+            username=ANOTHER_AUTHOR_USERNAME
+        )
+        cls.post = models.Post.objects.create(
+            text='Тестовый текст',
+            author=cls.author,
+        )
+        cls.POST_URL = reverse('posts:post_detail', args=[cls.post.id])
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+
+    def test_repeat_request_is_answered_with_304(self):
+        """Повторный запрос с ETag получает 304 без тела."""
+        response = self.guest.get(self.POST_URL)
+        response = self.guest.get(
+            self.POST_URL,
+            HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_if_modified_since_alone_is_not_trusted(self):
+        """Без ETag страница отдаётся целиком: по секундам 304 неточен."""
+        response = self.guest.get(self.POST_URL)
+        self.assertNotIn('Last-Modified', response)
+        response = self.guest.get(
+            self.POST_URL,
+            HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60)
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_pages_are_touched_after_commit(self):
+        """Страница, сохранённая до коммита, после него сбрасывается."""
+        pending = []
+        with mock.patch(
+            'django.db.transaction.on_commit', side_effect=pending.append
+        ):
+            models.Comment.objects.create(
+                post=self.post,
+                author=self.another_author,
+                text='Новый комментарий'
+            )
+        etag = self.guest.get(self.POST_URL)['ETag']
+        for func in pending:
+            func()
+        response = self.guest.get(self.POST_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_cached_page_is_served_without_queries(self):
+        """Повторная страница для гостя отдаётся из кеша."""
+        content = self.guest.get(PROFILE_URL).content
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest.get(PROFILE_URL)
+        self.assertEqual(response.content, content)
+        self.assertEqual(len(queries), 0)
+
+    def test_comment_invalidates_only_its_post(self):
+        """Комментарий сбрасывает страницу поста, но не чужой профиль."""
+        post_etag = self.guest.get(self.POST_URL)['ETag']
+        profile_etag = self.guest.get(ANOTHER_PROFILE_URL)['ETag']
+        models.Comment.objects.create(
+            post=self.post,
+            author=self.another_author,
+            text='Новый комментарий'
+        )
+        response = self.guest.get(self.POST_URL, HTTP_IF_NONE_MATCH=post_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новый комментарий')
+        response = self.guest.get(
+            ANOTHER_PROFILE_URL,
+            HTTP_IF_NONE_MATCH=profile_etag
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_logged_in_user_bypasses_cache(self):
+        """Авторизованный пользователь получает страницу без кеша."""
+        self.guest.get(INDEX_URL)
+        client = Client()
+        client.force_login(self.author)
+        response = client.get(INDEX_URL)
+        self.assertNotIn('ETag', response)
+        self.assertIsNotNone(response.context)
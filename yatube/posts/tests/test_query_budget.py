@@ -0,0 +1,113 @@
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.middleware import QueryBudgetExceeded
+
+from .. import models, views
+
+SLUG = 'test-slug'
+AUTHOR_USERNAME = 'TestAuthor'
+READER_USERNAME = 'TestReader'
+INDEX_URL = reverse('posts:index')
+GROUP_LIST_URL = reverse('posts:group_list', args=[SLUG])
+PROFILE_URL = reverse('posts:profile', args=[AUTHOR_USERNAME])
+CREATE_URL = reverse('posts:post_create')
+FOLLOW_INDEX_URL = reverse('posts:follow_index')
+SEARCH_URL = reverse('posts:search') + '?q=текст'
+FOLLOW_AUTHOR_URL = reverse('posts:profile_follow', args=[AUTHOR_USERNAME])
+UNFOLLOW_AUTHOR_URL = reverse(
+    'posts:profile_unfollow',
+    args=[AUTHOR_USERNAME]
+)
+
+
+@override_settings(QUERY_BUDGET_MODE='raise')
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = models.Group.objects.create(
+            title='Тестовый заголовок',
+            slug=SLUG,
+            description='Тестовое описание'
+        )
+        cls.author = models.User.objects.create_user(username=AUTHOR_USERNAME)
+        cls.reader = models.User.objects.create_user(username=READER_USERNAME)
+        models.Follow.objects.create(user=cls.reader, author=cls.author)
+        for _ in range(settings.POSTS_PER_PAGE + 1):
+            cls.post = models.Post.objects.create(
+                text='Тестовый текст',
+                author=cls.author,
+                group=cls.group,
+            )
+            for user in (cls.author, cls.reader):
+                models.Comment.objects.create(
+                    post=cls.post,
+                    author=user,
+                    text='Тестовый комментарий',
+                )
+        cls.POST_DETAIL_URL = reverse('posts:post_detail', args=[cls.post.id])
+        cls.POST_EDIT_URL = reverse('posts:post_edit', args=[cls.post.id])
+        cls.ADD_COMMENT_URL = reverse('posts:add_comment', args=[cls.post.id])
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_pages_fit_their_budgets(self):
+        """Страницы укладываются в свой бюджет запросов."""
+        cases = [
+            [self.guest, INDEX_URL],
+            [self.guest, GROUP_LIST_URL],
+            [self.guest, PROFILE_URL],
+            [self.guest, self.POST_DETAIL_URL],
+            [self.reader_client, INDEX_URL],
+            [self.reader_client, GROUP_LIST_URL],
+            [self.reader_client, PROFILE_URL],
+            [self.reader_client, self.POST_DETAIL_URL],
+            [self.reader_client, FOLLOW_INDEX_URL],
+            [self.reader_client, SEARCH_URL],
+            [self.reader_client, CREATE_URL],
+            [self.author_client, self.POST_EDIT_URL],
+        ]
+        for client, url in cases:
+            with self.subTest(url=url):
+                self.assertEqual(client.get(url).status_code, 200)
+
+    def test_actions_fit_their_budgets(self):
+        """Изменяющие запросы укладываются в свой бюджет."""
+        cases = [
+            [self.author_client, CREATE_URL, {'text': 'Новый пост'}],
+            [self.author_client, self.POST_EDIT_URL, {'text': 'Правка'}],
+            [self.reader_client, self.ADD_COMMENT_URL, {'text': 'Ещё'}],
+            [self.reader_client, UNFOLLOW_AUTHOR_URL, None],
+            [self.reader_client, FOLLOW_AUTHOR_URL, None],
+        ]
+        for client, url, data in cases:
+            with self.subTest(url=url):
+                if data is None:
+                    response = client.get(url)
+                else:
+                    response = client.post(url, data)
+                self.assertEqual(response.status_code, 302)
+
+    def test_exceeded_budget_raises(self):
+        """Превышение бюджета в режиме 'raise' роняет запрос."""
+        with mock.patch.object(views.index, 'query_budget', 0):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.guest.get(INDEX_URL)
+
+    @override_settings(QUERY_BUDGET_MODE='log')
+    def test_exceeded_budget_is_logged(self):
+        """Превышение бюджета в режиме 'log' пишется в лог."""
+        with mock.patch.object(views.index, 'query_budget', 0):
+            with self.assertLogs('core.middleware', 'WARNING'):
+                self.guest.get(INDEX_URL)
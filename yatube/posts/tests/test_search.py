@@ -0,0 +1,95 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import models, search
+
+AUTHOR_USERNAME = 'TestAuthor'
+SEARCH_URL = reverse('posts:search')
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = models.User.objects.create_user(
+            username=AUTHOR_USERNAME,
+            is_staff=True,
+            is_superuser=True,
+        )
+        cls.exact = models.Post.objects.create(
+            text='Котики котики котики',
+            author=cls.author,
+        )
+        cls.mention = models.Post.objects.create(
+            text='Про собак, но и котики тут есть, хотя речь о другом',
+            author=cls.author,
+        )
+        cls.commented = models.Post.objects.create(
+            text='Пост без нужного слова',
+            author=cls.author,
+        )
+        models.Comment.objects.create(
+            post=cls.commented,
+            author=cls.author,
+            text='А где котики?',
+        )
+        models.Post.objects.create(text='Совсем другое', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+
+    def found(self, query):
+        response = self.guest.get(SEARCH_URL, {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_results_are_ranked(self):
+        """Находятся посты и комментарии, лучшие совпадения выше."""
+        self.assertEqual(
+            self.found('котики'),
+            [self.exact, self.mention, self.commented]
+        )
+
+    def test_index_follows_changes(self):
+        """Правка и удаление поста сразу видны в поиске."""
+        post = models.Post.objects.get(pk=self.exact.pk)
+        post.text = 'Теперь про попугаев'
+        post.save()
+        self.assertEqual(self.found('попугаев'), [post])
+        self.assertNotIn(post, self.found('котики'))
+        post.delete()
+        self.assertEqual(self.found('попугаев'), [])
+
+    def test_query_syntax_is_not_interpreted(self):
+        """Кавычки и операторы FTS5 во вводе не ломают поиск."""
+        self.assertEqual(
+            self.found('котики*")('),
+            [self.exact, self.mention, self.commented]
+        )
+        self.assertEqual(self.found('   '), [])
+
+    def test_rebuild_restores_index(self):
+        """Команда перестраивает индекс с нуля."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.POST_INDEX}')
+        self.assertEqual(self.found('собак'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.found('собак'), [self.mention])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт через индекс, без LIKE по таблице."""
+        client = Client()
+        client.force_login(self.author)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(
+                reverse('admin:posts_post_changelist'), {'q': 'котики'}
+            )
+        self.assertEqual(response.context['cl'].result_count, 2)
+        for query in queries.captured_queries:
+            self.assertNotIn('LIKE', query['sql'])
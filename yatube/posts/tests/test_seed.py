@@ -0,0 +1,90 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Count, F
+from django.test import TestCase
+
+from .. import models, search, stats
+
+USERS = 20
+POSTS = 100
+
+
+class SeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'seed_yatube',
+            users=USERS,
+            groups=3,
+            posts=POSTS,
+            comments=1,
+            follows=3,
+            seed=1,
+            batch_size=7,
+            stdout=StringIO(),
+        )
+
+    def test_scale(self):
+        """Создаётся заданное число пользователей, групп и постов."""
+        self.assertEqual(models.User.objects.count(), USERS)
+        self.assertEqual(models.Group.objects.count(), 3)
+        self.assertEqual(models.Post.objects.count(), POSTS)
+        self.assertTrue(models.Comment.objects.exists())
+        self.assertTrue(models.Follow.objects.exists())
+
+    def test_activity_is_skewed(self):
+        """Самый активный автор пишет заметно больше среднего."""
+        top = models.Post.objects.values('author').annotate(
+            total=Count('pk')
+        ).order_by('-total')[0]['total']
+        self.assertGreater(top, 2 * POSTS / USERS)
+
+    def test_comments_follow_posts(self):
+        """Комментарии не старше своих постов."""
+        self.assertFalse(models.Comment.objects.filter(
+            created__lt=F('post__pub_date')
+        ).exists())
+
+    def test_derived_data_is_consistent(self):
+        """Ленты, счётчики и поисковый индекс соответствуют данным."""
+        expected = sum(
+            models.Post.objects.filter(author_id=follow.author_id).count()
+            for follow in models.Follow.objects.all()
+        )
+        self.assertEqual(models.TimelineEntry.objects.count(), expected)
+        for user in models.User.objects.all():
+            with self.subTest(user=user.username):
+                stored = stats.get_stats(user.id)
+                self.assertEqual(
+                    {field: getattr(stored, field) for field in (
+                        'posts_count', 'followers_count', 'following_count'
+                    )},
+                    stats.count(user.id)
+                )
+        post = models.Post.objects.first()
+        self.assertTrue(search.matching(
+            models.Post.objects.filter(pk=post.pk),
+            post.text,
+            search.POST_INDEX,
+        ).exists())
+
+    def test_comments_average(self):
+        """Среднее число комментариев на пост близко к заданному."""
+        call_command(
+            'seed_yatube',
+            users=10,
+            groups=0,
+            posts=2000,
+            comments=3,
+            follows=0,
+            prefix='average',
+            seed=2,
+            stdout=StringIO(),
+        )
+        posts = models.Post.objects.filter(
+            author__username__startswith='average-'
+        )
+        comments = models.Comment.objects.filter(post__in=posts).count()
+        self.assertAlmostEqual(comments / posts.count(), 3, delta=0.3)
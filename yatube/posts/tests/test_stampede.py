@@ -0,0 +1,70 @@
+import threading
+import time
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from core import stampede
+
+
+class StampedeTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_misses_compute_once(self):
+        """Одновременные промахи пересчитывают значение один раз."""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'fragment'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                stampede.fetch('key', compute, 60)
+            ))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['fragment'] * 5)
+        self.assertEqual(stampede.metrics()['coalesced'], 4)
+
+    def test_stale_value_is_served_during_recompute(self):
+        """Пока один запрос пересчитывает, остальные получают старое."""
+        stampede.fetch('key', lambda: 'old', 60)
+        cache.add(stampede.LOCK_KEY.format('key'), 1)
+        with mock.patch('time.time', return_value=time.time() + 61):
+            value = stampede.fetch('key', lambda: 'new', 60)
+        self.assertEqual(value, 'old')
+        self.assertEqual(stampede.metrics()['served_stale'], 1)
+
+    def test_value_is_refreshed_early(self):
+        """Близкое к истечению значение может обновиться заранее."""
+        def compute_old():
+            time.sleep(0.05)
+            return 'old'
+
+        stampede.fetch('key', compute_old, 60)
+        with mock.patch('time.time', return_value=time.time() + 59.9), \
+                mock.patch('random.random', return_value=0.999999):
+            value = stampede.fetch('key', lambda: 'new', 60)
+        self.assertEqual(value, 'new')
+        self.assertEqual(stampede.metrics()['early_refreshes'], 1)
+
+    def test_metrics_command(self):
+        """Команда показывает число избежанных пересчётов."""
+        stampede.record('coalesced')
+        stampede.record('served_stale')
+        out = StringIO()
+        call_command('cache_metrics', '--reset', stdout=out)
+        self.assertIn('Избежано пересчётов: 2', out.getvalue())
+        self.assertEqual(stampede.metrics()['coalesced'], 0)
@@ -0,0 +1,79 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import models
+
+AUTHOR_USERNAME = 'TestAuthor'
+READER_USERNAME = 'TestReader'
+PROFILE_URL = reverse('posts:profile', args=[AUTHOR_USERNAME])
+FOLLOW_AUTHOR_URL = reverse('posts:profile_follow', args=[AUTHOR_USERNAME])
+UNFOLLOW_AUTHOR_URL = reverse(
+    'posts:profile_unfollow',
+    args=[AUTHOR_USERNAME]
+)
+
+
+class UserStatsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = models.User.objects.create_user(username=AUTHOR_USERNAME)
+        cls.reader = models.User.objects.create_user(username=READER_USERNAME)
+        models.Post.objects.create(text='Тестовый текст', author=cls.author)
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def get_stats(self, user):
+        response = self.reader_client.get(
+            reverse('posts:profile', args=[user.username])
+        )
+        stats = response.context['stats']
+        return (
+            stats.posts_count,
+            stats.followers_count,
+            stats.following_count,
+        )
+
+    def test_counters_follow_changes(self):
+        """Счётчики меняются при постах, подписках и отписках."""
+        self.assertEqual(self.get_stats(self.author), (1, 0, 0))
+        self.assertEqual(self.get_stats(self.reader), (0, 0, 0))
+        self.reader_client.get(FOLLOW_AUTHOR_URL)
+        post = models.Post.objects.create(text='Ещё', author=self.author)
+        self.assertEqual(self.get_stats(self.author), (2, 1, 0))
+        self.assertEqual(self.get_stats(self.reader), (0, 0, 1))
+        post.delete()
+        self.reader_client.get(UNFOLLOW_AUTHOR_URL)
+        self.assertEqual(self.get_stats(self.author), (1, 0, 0))
+        self.assertEqual(self.get_stats(self.reader), (0, 0, 0))
+
+    def test_profile_does_not_count_rows(self):
+        """Шапка профиля не выполняет COUNT(*)."""
+        self.reader_client.get(PROFILE_URL)
+        with CaptureQueriesContext(connection) as queries:
+            self.reader_client.get(PROFILE_URL)
+        for query in queries.captured_queries:
+            with self.subTest(sql=query['sql']):
+                self.assertNotIn('COUNT(', query['sql'].upper())
+
+    def test_recount_command_fixes_drift(self):
+        """Команда recount_user_stats исправляет разошедшиеся счётчики."""
+        models.UserStats.objects.filter(user=self.author).update(
+            posts_count=42,
+            followers_count=7,
+        )
+        models.UserStats.objects.filter(user=self.reader).delete()
+        out = StringIO()
+        call_command('recount_user_stats', stdout=out)
+        self.assertIn('Исправлено записей: 2', out.getvalue())
+        self.assertEqual(self.get_stats(self.author), (1, 0, 0))
+        self.assertTrue(
+            models.UserStats.objects.filter(user=self.reader).exists()
+        )
@@ -0,0 +1,143 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import settings as thumbnail_settings
+
+from .. import models, thumbnails
+
+AUTHOR_USERNAME = 'TestAuthor'
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=2)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = models.User.objects.create_user(username=AUTHOR_USERNAME)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        on_commit = mock.patch(
+            'django.db.transaction.on_commit',
+            side_effect=lambda func: func()
+        )
+        on_commit.start()
+        self.addCleanup(on_commit.stop)
+        executor = mock.patch.object(thumbnails, 'executor')
+        self.executor = executor.start()
+        self.addCleanup(executor.stop)
+
+    def create_post(self, color=None):
+        content = SMALL_GIF
+        if color is not None:
+            buffer = io.BytesIO()
+            Image.new('RGB', (2, 1), color).save(buffer, 'GIF')
+            content = buffer.getvalue()
+        return models.Post.objects.create(
+            text='Пост с картинкой',
+            author=self.author,
+            image=SimpleUploadedFile('small.gif', content, 'image/gif'),
+        )
+
+    def test_new_image_is_scheduled(self):
+        """Новая картинка обрабатывается в фоне."""
+        post = self.create_post()
+        self.executor().submit.assert_called_once_with(
+            thumbnails.process,
+            post.image.name
+        )
+
+    def test_text_edit_does_not_schedule(self):
+        """Правка текста не заказывает миниатюры повторно."""
+        post = models.Post.objects.get(pk=self.create_post().pk)
+        self.executor().submit.reset_mock()
+        post.text = 'Новый текст'
+        post.save()
+        self.executor().submit.assert_not_called()
+
+    def test_page_reads_pregenerated_thumbnail(self):
+        """Страница поста не создаёт миниатюру, если она уже есть."""
+        post = self.create_post()
+        thumbnails.generate(post.image.name)
+        with mock.patch.object(
+            ThumbnailBackend, '_create_thumbnail'
+        ) as create:
+            response = Client().get(
+                reverse('posts:post_detail', args=[post.id])
+            )
+        create.assert_not_called()
+        self.assertContains(response, 'card-img')
+
+    def test_deleted_post_leaves_no_thumbnails(self):
+        """С последним постом удаляются все его миниатюры."""
+        post = self.create_post()
+        thumbnails.generate(post.image.name)
+        Client().get(reverse('posts:post_detail', args=[post.id]))
+        thumbnails.resolve([post.image], 'card')
+        prefix = os.path.join(
+            TEMP_MEDIA_ROOT, thumbnail_settings.THUMBNAIL_PREFIX
+        )
+        self.assertTrue(any(files for _, _, files in os.walk(prefix)))
+        post.delete()
+        self.assertEqual(
+            [files for _, _, files in os.walk(prefix) if files], []
+        )
+
+    def test_feed_resolves_thumbnails_in_one_lookup(self):
+        """Адреса миниатюр страницы читаются из кеша одним запросом."""
+        posts = [
+            self.create_post(color) for color in ('red', 'green', 'blue')
+        ]
+        for post in posts:
+            thumbnails.generate(post.image.name)
+        with mock.patch.object(
+            thumbnails, 'get_thumbnail'
+        ) as get_thumbnail, mock.patch.object(
+            cache, 'get_many', wraps=cache.get_many
+        ) as get_many:
+            resolved = thumbnails.resolve(
+                [post.image for post in posts], 'card'
+            )
+        get_thumbnail.assert_not_called()
+        get_many.assert_called_once()
+        self.assertEqual(len(set(resolved.values())), 3)
+
+    def test_card_offers_variants_by_width(self):
+        """Карточка предлагает браузеру варианты картинки по ширине."""
+        post = self.create_post()
+        with mock.patch.object(thumbnails, 'formats', return_value=(
+            'JPEG',
+        )):
+            response = Client().get(
+                reverse('posts:post_detail', args=[post.id])
+            )
+        thumbnail = response.context['thumbnail']
+        for width in settings.POST_THUMBNAIL_WIDTHS:
+            with self.subTest(width=width):
+                self.assertIn(f' {width}w', thumbnail.srcset)
+        self.assertContains(response, 'srcset=')
+        self.assertNotContains(response, 'image/webp')
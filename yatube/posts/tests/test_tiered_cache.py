@@ -0,0 +1,70 @@
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from core.cache_backends import TieredCache
+
+SHARED = 'tiered-tests-shared'
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    SHARED: {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': SHARED,
+    },
+})
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        caches[SHARED].clear()
+        # Два «процесса» с разными L1 над общим L2.
+        self.first = self.make_cache('first')
+        self.second = self.make_cache('second')
+        self.first.clear()
+        self.second.clear()
+
+    def make_cache(self, name):
+        return TieredCache(name, {'OPTIONS': {
+            'SHARED': SHARED,
+            'INVALIDATION_INTERVAL': 0,
+        }})
+
+    def test_hot_key_is_served_from_l1(self):
+        """Повторное чтение не обращается к общему кешу."""
+        self.first.set('key', 'value')
+        caches[SHARED].set('key', 'changed in bypass')
+        self.assertEqual(self.first.get('key'), 'value')
+
+    def test_write_evicts_l1_in_other_process(self):
+        """Запись в одном процессе вытесняет L1 в другом."""
+        self.first.set('key', 'old')
+        self.assertEqual(self.second.get('key'), 'old')
+        self.first.set('key', 'new')
+        self.assertEqual(self.second.get('key'), 'new')
+        self.first.delete('key')
+        self.assertIsNone(self.second.get('key'))
+
+    def test_incr_is_seen_by_other_process(self):
+        """Счётчик поколений, увеличенный в одном процессе, виден в другом."""
+        self.first.set('generation', 1)
+        self.assertEqual(self.second.get('generation'), 1)
+        self.first.incr('generation')
+        self.assertEqual(self.second.get('generation'), 2)
+
+    def test_mutable_values_are_not_shared(self):
+        """Изменение прочитанного объекта не портит значение в L1."""
+        self.first.set('key', {'posts': []})
+        self.first.get('key')['posts'].append(1)
+        self.assertEqual(self.first.get('key'), {'posts': []})
+
+    def test_sustained_writes_keep_other_l1_entries(self):
+        """Поток записей чужих ключей не очищает L1 другого процесса."""
+        self.first.set('hot', 'value')
+        self.assertEqual(self.second.get('hot'), 'value')
+        for index in range(120):
+            self.first.set(f'page:{index}', index)
+        caches[SHARED].set('hot', 'changed in bypass')
+        self.assertEqual(self.second.get('hot'), 'value')
+        self.first.set('hot', 'new')
+        self.assertEqual(self.second.get('hot'), 'new')
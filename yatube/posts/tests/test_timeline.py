@@ -0,0 +1,126 @@
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import models
+
+AUTHOR_USERNAME = 'TestAuthor'
+ANOTHER_AUTHOR_USERNAME = 'TestAnotherAuthor'
+READER_USERNAME = 'TestReader'
+FOLLOW_INDEX_URL = reverse('posts:follow_index')
+FOLLOW_AUTHOR_URL = reverse('posts:profile_follow', args=[AUTHOR_USERNAME])
+UNFOLLOW_AUTHOR_URL = reverse(
+    'posts:profile_unfollow',
+    args=[AUTHOR_USERNAME]
+)
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = models.User.objects.create_user(username=AUTHOR_USERNAME)
+        cls.reader = models.User.objects.create_user(username=READER_USERNAME)
+        cls.old_post = models.Post.objects.create(
+            text='Старый пост',
+            author=cls.author,
+        )
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def timeline_post_ids(self):
+        return list(self.reader.timeline.values_list('post_id', flat=True))
+
+    def test_follow_backfills_timeline(self):
+        """После подписки старые посты автора попадают в ленту."""
+        self.reader_client.get(FOLLOW_AUTHOR_URL)
+        self.assertEqual(self.timeline_post_ids(), [self.old_post.id])
+
+    def test_new_post_is_pushed_to_followers(self):
+        """Новый пост раскладывается по лентам подписчиков."""
+        models.Follow.objects.create(user=self.reader, author=self.author)
+        post = models.Post.objects.create(
+            text='Новый пост', author=self.author
+        )
+        self.assertIn(post.id, self.timeline_post_ids())
+        response = self.reader_client.get(FOLLOW_INDEX_URL)
+        self.assertEqual(response.context['page_obj'][0], post)
+
+    def test_unfollow_prunes_timeline(self):
+        """После отписки посты автора пропадают из ленты."""
+        models.Follow.objects.create(user=self.reader, author=self.author)
+        self.reader_client.get(UNFOLLOW_AUTHOR_URL)
+        self.assertEqual(self.timeline_post_ids(), [])
+        response = self.reader_client.get(FOLLOW_INDEX_URL)
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_follow_index_reads_only_timeline(self):
+        """Лента подписок не соединяет посты с таблицей подписок."""
+        models.Follow.objects.create(user=self.reader, author=self.author)
+        with CaptureQueriesContext(connection) as queries:
+            self.reader_client.get(FOLLOW_INDEX_URL)
+        for query in queries.captured_queries:
+            with self.subTest(sql=query['sql']):
+                self.assertFalse(
+                    'posts_follow' in query['sql']
+                    and 'posts_post' in query['sql']
+                )
+
+
+@override_settings(TIMELINE_PULL_THRESHOLD=1)
+class HybridTimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.popular = models.User.objects.create_user(username=AUTHOR_USERNAME)
+        cls.ordinary = models.User.objects.create_user(
+            username=ANOTHER_AUTHOR_USERNAME
+        )
+        cls.reader = models.User.objects.create_user(username=READER_USERNAME)
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_popular_author_is_pulled_not_pushed(self):
+        """Посты популярного автора не пишутся в ленты подписчиков."""
+        models.Follow.objects.create(user=self.reader, author=self.popular)
+        self.assertTrue(models.PulledAuthor.objects.filter(
+            author=self.popular
+        ).exists())
+        models.Post.objects.create(text='Пост', author=self.popular)
+        self.assertFalse(self.reader.timeline.exists())
+
+    def test_pulled_posts_are_merged_into_feed(self):
+        """Посты популярного автора подмешиваются в ленту по дате."""
+        models.Follow.objects.create(user=self.reader, author=self.popular)
+        with self.settings(TIMELINE_PULL_THRESHOLD=100):
+            models.Follow.objects.create(
+                user=self.reader,
+                author=self.ordinary
+            )
+        posts = [
+            models.Post.objects.create(text=str(number), author=author)
+            for number, author in enumerate(
+                [self.popular, self.ordinary] * 7
+            )
+        ]
+        posts.reverse()
+        with self.settings(POSTS_PER_PAGE=5):
+            first_page = self.reader_client.get(
+                FOLLOW_INDEX_URL
+            ).context['page_obj']
+            second_page = self.reader_client.get(
+                FOLLOW_INDEX_URL,
+                {'cursor': first_page.next_cursor}
+            ).context['page_obj']
+            back_page = self.reader_client.get(
+                FOLLOW_INDEX_URL,
+                {'cursor': second_page.previous_cursor}
+            ).context['page_obj']
+        self.assertEqual(list(first_page), posts[:5])
+        self.assertEqual(list(second_page), posts[5:10])
+        self.assertEqual(list(back_page), posts[:5])
@@ -0,0 +1,217 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import media, models, search, transfer
+
+AUTHOR_USERNAME = 'TestAuthor'
+READER_USERNAME = 'TestReader'
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SOURCE_MEDIA_ROOT = os.path.join(TEMP_DIR, 'source')
+TARGET_MEDIA_ROOT = os.path.join(TEMP_DIR, 'target')
+EXPORT_MEDIA_DIR = os.path.join(TEMP_DIR, 'export')
+EXPORT_PATH = os.path.join(TEMP_DIR, 'posts.jsonl')
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=SOURCE_MEDIA_ROOT)
+class TransferTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = models.User.objects.create_user(username=AUTHOR_USERNAME)
+        cls.reader = models.User.objects.create_user(username=READER_USERNAME)
+        cls.group = models.Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.post = models.Post.objects.create(
+            text='Пост про котиков',
+            author=self.author,
+            group=self.group,
+            image=SimpleUploadedFile('cat.gif', SMALL_GIF, 'image/gif'),
+        )
+        self.comment = models.Comment.objects.create(
+            post=self.post,
+            author=self.reader,
+            text='Комментарий про собак',
+        )
+        models.Follow.objects.create(user=self.reader, author=self.author)
+
+    def snapshot(self):
+        return {
+            'groups': list(models.Group.objects.values()),
+            'posts': list(models.Post.objects.values(
+                'id', 'text', 'pub_date', 'updated', 'author__username',
+                'group_id', 'image'
+            )),
+            'comments': list(models.Comment.objects.values(
+                'id', 'post_id', 'author__username', 'text', 'created'
+            )),
+            'follows': list(models.Follow.objects.values_list(
+                'user__username', 'author__username'
+            )),
+        }
+
+    def import_posts(self):
+        out = StringIO()
+        call_command(
+            'import_posts',
+            EXPORT_PATH,
+            media_dir=EXPORT_MEDIA_DIR,
+            batch_size=1,
+            stdout=out,
+        )
+        return out.getvalue()
+
+    def test_round_trip(self):
+        """Выгрузка загружается в пустую базу без потерь."""
+        before = self.snapshot()
+        call_command(
+            'export_posts',
+            EXPORT_PATH,
+            media_dir=EXPORT_MEDIA_DIR,
+            stdout=StringIO(),
+        )
+        models.Group.objects.all().delete()
+        models.User.objects.all().delete()
+        with override_settings(MEDIA_ROOT=TARGET_MEDIA_ROOT):
+            output = self.import_posts()
+            self.assertTrue(media.storage().exists(self.post.image.name))
+        self.assertIn(
+            'Загружено: групп 1, постов 1, комментариев 1, подписок 1',
+            output
+        )
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual(
+            models.MediaFile.objects.get(name=self.post.image.name).references,
+            1
+        )
+        author = models.User.objects.get(username=AUTHOR_USERNAME)
+        reader = models.User.objects.get(username=READER_USERNAME)
+        self.assertFalse(author.has_usable_password())
+        self.assertEqual(author.stats.posts_count, 1)
+        self.assertEqual(reader.stats.following_count, 1)
+        self.assertTrue(reader.timeline.filter(post_id=self.post.id).exists())
+        for queryset, text, index in (
+            (models.Post.objects, 'котик', search.POST_INDEX),
+            (models.Comment.objects, 'собак', search.COMMENT_INDEX),
+        ):
+            with self.subTest(index=index):
+                self.assertEqual(
+                    search.matching(queryset.all(), text, index).count(), 1
+                )
+
+    @override_settings(TIMELINE_PULL_THRESHOLD=1)
+    def test_popular_author_is_pulled_after_import(self):
+        """Популярного автора из выгрузки ленты читают на лету."""
+        call_command('export_posts', EXPORT_PATH, stdout=StringIO())
+        models.Group.objects.all().delete()
+        models.User.objects.all().delete()
+        self.import_posts()
+        author = models.User.objects.get(username=AUTHOR_USERNAME)
+        self.assertTrue(
+            models.PulledAuthor.objects.filter(author=author).exists()
+        )
+        self.assertFalse(models.TimelineEntry.objects.exists())
+
+    def test_import_refreshes_cached_pages(self):
+        """После загрузки страницы показывают загруженные посты."""
+        call_command('export_posts', EXPORT_PATH, stdout=StringIO())
+        models.Post.objects.all().delete()
+        cache.clear()
+        guest = Client()
+        self.assertNotContains(guest.get(reverse('posts:index')), 'котиков')
+        self.import_posts()
+        self.assertContains(guest.get(reverse('posts:index')), 'котиков')
+
+    def test_group_is_matched_by_slug(self):
+        """Группа с уже занятым slug не теряется, посты попадают в неё."""
+        call_command('export_posts', EXPORT_PATH, stdout=StringIO())
+        models.Post.objects.all().delete()
+        models.Group.objects.all().delete()
+        existing = models.Group.objects.create(
+            title='Группа из базы',
+            slug=self.group.slug,
+            description='Тестовое описание',
+        )
+        self.import_posts()
+        self.assertNotEqual(existing.pk, self.group.pk)
+        self.assertEqual(models.Post.objects.get().group, existing)
+
+    def test_posts_saved_during_import_get_dates(self):
+        """Посты, сохранённые во время загрузки, получают текущую дату."""
+        call_command('export_posts', EXPORT_PATH, stdout=StringIO())
+        models.Post.objects.all().delete()
+        saved, insert = [], transfer.insert_as_is
+
+        def save_post(*args):
+            saved.append(models.Post.objects.create(
+                text='Пост во время загрузки', author=self.author
+            ))
+            return insert(*args)
+
+        with mock.patch.object(
+            transfer, 'insert_as_is', side_effect=save_post
+        ):
+            self.import_posts()
+        self.assertIsNotNone(saved[0].pub_date)
+        self.assertEqual(
+            models.Post.objects.get(pk=self.post.pk).pub_date,
+            self.post.pub_date
+        )
+
+    def test_import_is_repeatable(self):
+        """Повторная загрузка не дублирует записи и ссылки на файлы."""
+        call_command('export_posts', EXPORT_PATH, stdout=StringIO())
+        before = self.snapshot()
+        self.import_posts()
+        self.import_posts()
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual(
+            models.MediaFile.objects.get(name=self.post.image.name).references,
+            1
+        )
+
+    def test_post_with_taken_id_gets_new_id(self):
+        """Пост с id, занятым другим постом, загружается под новым id."""
+        call_command('export_posts', EXPORT_PATH, stdout=StringIO())
+        models.Post.objects.all().delete()
+        other = models.Post.objects.create(
+            id=self.post.pk, text='Другой пост', author=self.reader
+        )
+        self.import_posts()
+        self.import_posts()
+        self.assertEqual(
+            models.Post.objects.get(pk=other.pk).text, 'Другой пост'
+        )
+        imported = models.Post.objects.exclude(pk=other.pk).get()
+        self.assertEqual(imported.text, self.post.text)
+        self.assertEqual(
+            list(models.Comment.objects.values_list('post_id', 'text')),
+            [(imported.pk, self.comment.text)]
+        )
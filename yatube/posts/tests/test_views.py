@@ -2,8 +2,11 @@ import shutil
 import tempfile
 
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from .. import models
@@ -181,6 +184,9 @@ class PaginatorViewsTest(TestCase):
             PROFILE_URL
         ]
 
+    def setUp(self):
+        cache.clear()
+
     def test_first_page_contains_right_number_of_records(self):
         """Проверка первой страницы пагинатора."""
         for url in self.URLS:
@@ -197,3 +203,88 @@ class PaginatorViewsTest(TestCase):
             with self.subTest(url=url):
                 response = self.guest_client.get(url + '?page=2')
                 self.assertEqual(len(response.context['page_obj']), 1)
+
+    def test_cursor_pages_walk_forward_and_back(self):
+        """Курсорная пагинация отдаёт те же страницы вперёд и назад."""
+        for url in self.URLS:
+            with self.subTest(url=url):
+                first_page = self.guest_client.get(url).context['page_obj']
+                self.assertEqual(len(first_page), settings.POSTS_PER_PAGE)
+                self.assertIsNone(first_page.previous_cursor)
+                second_page = self.guest_client.get(
+                    url, {'cursor': first_page.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(len(second_page), 1)
+                self.assertEqual(second_page.number, 2)
+                self.assertIsNone(second_page.next_cursor)
+                self.assertNotIn(second_page[0], list(first_page))
+                back_page = self.guest_client.get(
+                    url, {'cursor': second_page.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(back_page), list(first_page))
+                self.assertEqual(back_page.number, 1)
+
+    def test_cursor_page_does_not_count_or_offset(self):
+        """Курсорная страница не делает COUNT(*) и OFFSET."""
+        first_page = self.guest_client.get(INDEX_URL).context['page_obj']
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(
+                INDEX_URL, {'cursor': first_page.next_cursor}
+            )
+        for query in queries.captured_queries:
+            with self.subTest(sql=query['sql']):
+                self.assertNotIn('COUNT(', query['sql'].upper())
+                self.assertNotIn('OFFSET', query['sql'].upper())
+
+    def test_broken_cursor_returns_first_page(self):
+        """Испорченный курсор ведёт на первую страницу."""
+        response = self.guest_client.get(INDEX_URL, {'cursor': '%%%'})
+        self.assertEqual(response.context['page_obj'].number, 1)
+        self.assertEqual(
+            len(response.context['page_obj']),
+            settings.POSTS_PER_PAGE
+        )
+
+
+class CardQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = models.User.objects.create_user(username=ANOTHER_USERNAME)
+        cls.author = models.User.objects.create_user(username=AUTHOR_USERNAME)
+        cls.group = models.Group.objects.create(
+            title='Тестовый заголовок',
+            slug=SLUG,
+            description='Тестовое описание'
+        )
+        models.Follow.objects.create(user=cls.reader, author=cls.author)
+        for number in range(6):
+            models.Post.objects.create(
+                text=f'Тестовый текст {number}',
+                author=cls.author,
+                group=models.Group.objects.create(
+                    title=f'Группа {number}',
+                    slug=f'group-{number}',
+                    description='Тестовое описание'
+                ) if number % 2 else cls.group,
+            )
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+
+    def count_queries(self, url, per_page):
+        cache.clear()
+        with self.settings(POSTS_PER_PAGE=per_page):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.reader_client.get(url)
+        self.assertEqual(len(response.context['page_obj']), per_page)
+        return len(queries)
+
+    def test_feed_query_count_does_not_depend_on_page_size(self):
+        """Число запросов ленты не зависит от размера страницы."""
+        for url in [INDEX_URL, GROUP_LIST_URL, PROFILE_URL, FOLLOW_INDEX_URL]:
+            with self.subTest(url=url):
+                per_page = 3 if url == GROUP_LIST_URL else 5
+                self.assertEqual(
+                    self.count_queries(url, 1),
+                    self.count_queries(url, per_page)
+                )
@@ -0,0 +1,165 @@
+import hashlib
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from PIL import features
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from . import images
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_KEY = 'posts:thumbnails:{}:{}'
+
+Thumbnail = namedtuple('Thumbnail', 'src srcset webp_srcset')
+
+_executor = None
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails'
+        )
+    return _executor
+
+
+def thumbnail_key(name, size):
+    return THUMBNAIL_KEY.format(size, hashlib.md5(name.encode()).hexdigest())
+
+
+def source(image):
+    """Картинка поста для sorl в хранилище поля Post.image.
+
+    Ключ sorl включает хранилище, поэтому строка с именем (её sorl
+    отнёс бы к default_storage) и файл поля дали бы разные ключи
+    и разные файлы миниатюр.
+    """
+    return ImageFile(
+        getattr(image, 'name', image), Post._meta.get_field('image').storage
+    )
+
+
+def formats():
+    """Форматы вариантов; WebP - только если Pillow собран с ним."""
+    if features.check('webp'):
+        return ('WEBP', 'JPEG')
+    return ('JPEG',)
+
+
+def variants(size):
+    """Геометрии размера size для каждой ширины из POST_THUMBNAIL_WIDTHS.
+
+    Пропорции у всех вариантов те же, что у основной геометрии.
+    """
+    geometry, options = settings.POST_THUMBNAILS[size]
+    width, height = (int(side) for side in geometry.split('x'))
+    return [
+        (
+            variant_width,
+            f'{variant_width}x{round(height * variant_width / width)}',
+            options,
+        )
+        for variant_width in settings.POST_THUMBNAIL_WIDTHS
+        if variant_width <= width
+    ]
+
+
+def thumbnail(image, size):
+    """Миниатюра размера size из settings.POST_THUMBNAILS.
+
+    Возвращает Thumbnail: src - JPEG основной геометрии для старых
+    браузеров, srcset и webp_srcset - варианты по ширинам. Если
+    миниатюры уже созданы, файл не читается: sorl находит их в своём
+    хранилище ключей. Результат запоминается в кеше для resolve().
+    """
+    image = source(image)
+    name = image.name
+    srcsets = {}
+    for image_format in formats():
+        srcsets[image_format] = ', '.join(
+            '{} {}w'.format(
+                get_thumbnail(
+                    image, geometry, format=image_format, **options
+                ).url,
+                width
+            )
+            for width, geometry, options in variants(size)
+        )
+    geometry, options = settings.POST_THUMBNAILS[size]
+    result = Thumbnail(
+        src=get_thumbnail(image, geometry, format='JPEG', **options).url,
+        srcset=srcsets['JPEG'],
+        webp_srcset=srcsets.get('WEBP', ''),
+    )
+    cache.set(thumbnail_key(name, size), result, timeout=None)
+    return result
+
+
+def resolve(images, size):
+    """Миниатюры для всех картинок страницы одним get_many.
+
+    Возвращает словарь {имя картинки: Thumbnail}; для картинок,
+    которых нет в кеше, миниатюры получаются через sorl по одной,
+    а те, что не удалось обработать, в словарь не попадают.
+    """
+    names = {getattr(image, 'name', image) for image in images if image}
+    keys = {thumbnail_key(name, size): name for name in names}
+    found = {
+        keys[key]: value
+        for key, value in cache.get_many(list(keys)).items()
+    }
+    for name in names - found.keys():
+        try:
+            found[name] = thumbnail(name, size)
+        except Exception:
+            logger.exception('Не удалось получить миниатюру %s', name)
+    return found
+
+
+def forget(name):
+    """Убирает из кеша миниатюры удалённой картинки."""
+    cache.delete_many([
+        thumbnail_key(name, size) for size in settings.POST_THUMBNAILS
+    ])
+
+
+def generate(name):
+    """Создаёт миниатюры всех настроенных размеров и форматов."""
+    for size in settings.POST_THUMBNAILS:
+        thumbnail(name, size)
+
+
+def process(name):
+    """Нормализует загруженную картинку и создаёт её миниатюры."""
+    try:
+        generate(images.normalize(name))
+    except Exception:
+        logger.exception('Не удалось обработать картинку %s', name)
+    finally:
+        # Поток пула живёт долго, а соединение с БД ему открыл sorl.
+        close_old_connections()
+
+
+def schedule(post):
+    """Обрабатывает картинку поста в фоне после фиксации транзакции.
+
+    Так время ответа на создание поста не зависит от размера
+    картинки. При THUMBNAIL_WORKERS = 0 картинка обрабатывается
+    сразу после коммита в том же потоке.
+    """
+    name = post.image.name
+    if not name:
+        return
+    if settings.THUMBNAIL_WORKERS:
+        transaction.on_commit(lambda: executor().submit(process, name))
+    else:
+        transaction.on_commit(lambda: process(name))
@@ -0,0 +1,156 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Q
+
+from . import stats
+from .models import Follow, Post, PulledAuthor, TimelineEntry
+from .pagination import HybridTimelinePaginator, TimelinePaginator
+
+BATCH_SIZE = 1000
+# Сколько авторов раскладывать одним INSERT ... SELECT в fill().
+FILL_BATCH_SIZE = 500
+
+FILL_SQL = '''
+    INSERT INTO {timeline} (user_id, post_id, author_id, pub_date)
+    SELECT follow.user_id, post.id, post.author_id, post.pub_date
+    FROM {follow} AS follow
+    JOIN {post} AS post ON post.author_id = follow.author_id
+    WHERE follow.author_id IN ({placeholders})
+    AND NOT EXISTS (
+        SELECT 1 FROM {pulled} AS pulled
+        WHERE pulled.author_id = follow.author_id
+    )
+    AND NOT EXISTS (
+        SELECT 1 FROM {timeline} AS entry
+        WHERE entry.user_id = follow.user_id AND entry.post_id = post.id
+    )
+'''
+
+
+def _entries(user_ids, posts):
+    for user_id in user_ids:
+        for post in posts:
+            yield TimelineEntry(
+                user_id=user_id,
+                post_id=post.id,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+
+
+def _save(entries):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) == BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def is_pulled(author_id):
+    return PulledAuthor.objects.filter(author_id=author_id).exists()
+
+
+def push_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_pulled(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True).iterator()
+    _save(_entries(followers, [post]))
+
+
+def backfill(follow):
+    """Добавляет в ленту подписчика уже опубликованные посты автора.
+
+    Когда у автора набирается TIMELINE_PULL_THRESHOLD подписчиков,
+    он переводится в режим чтения на лету и больше не раскладывается.
+    """
+    if is_pulled(follow.author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=follow.author_id
+    ).only('id', 'author_id', 'pub_date').iterator()
+    _save(_entries([follow.user_id], posts))
+    followers = stats.get_stats(follow.author_id).followers_count
+    if followers >= settings.TIMELINE_PULL_THRESHOLD:
+        PulledAuthor.objects.get_or_create(author_id=follow.author_id)
+
+
+def pull_popular():
+    """Переводит в чтение на лету авторов с толпой подписчиков.
+
+    Подписчики считаются по таблице подписок, а не по счётчикам
+    профилей, поэтому годится сразу после вставки подписок в обход
+    сигналов; вызывается до fill().
+    """
+    popular = Follow.objects.values('author_id').annotate(
+        followers=Count('pk')
+    ).filter(
+        followers__gte=settings.TIMELINE_PULL_THRESHOLD
+    ).values_list('author_id', flat=True)
+    PulledAuthor.objects.bulk_create(
+        [PulledAuthor(author_id=author_id) for author_id in popular],
+        ignore_conflicts=True,
+    )
+
+
+def fill(author_ids):
+    """Раскладывает посты авторов по лентам их подписчиков.
+
+    Работает множествами: один INSERT ... SELECT на пачку авторов
+    вместо запроса на каждую подписку. Авторы, читаемые на лету,
+    и уже разложенные посты пропускаются. Возвращает число
+    добавленных записей.
+    """
+    tables = {
+        'timeline': TimelineEntry._meta.db_table,
+        'follow': Follow._meta.db_table,
+        'post': Post._meta.db_table,
+        'pulled': PulledAuthor._meta.db_table,
+    }
+    author_ids = sorted(author_ids)
+    count = 0
+    for start in range(0, len(author_ids), FILL_BATCH_SIZE):
+        batch = author_ids[start:start + FILL_BATCH_SIZE]
+        sql = FILL_SQL.format(
+            placeholders=', '.join(['%s'] * len(batch)), **tables
+        )
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, batch)
+            count += cursor.rowcount
+    return count
+
+
+def prune(follow):
+    """Убирает посты автора из ленты бывшего подписчика."""
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id,
+        author_id=follow.author_id,
+    ).delete()
+
+
+def follow_feed(user, per_page):
+    """Возвращает посты ленты подписок и курсорный пагинатор для неё."""
+    pulled_ids = list(Follow.objects.filter(
+        user=user,
+        author_id__in=PulledAuthor.objects.values('author_id'),
+    ).values_list('author_id', flat=True).distinct())
+    entries = TimelineEntry.objects.filter(user=user)
+    if not pulled_ids:
+        return (
+            Post.objects.for_cards().filter(timeline_entries__user=user),
+            TimelinePaginator(entries, per_page),
+        )
+    return (
+        Post.objects.for_cards().filter(
+            Q(timeline_entries__user=user) | Q(author_id__in=pulled_ids)
+        ).distinct(),
+        HybridTimelinePaginator(entries, per_page, [
+            Post.objects.for_cards().filter(author_id=author_id)
+            for author_id in pulled_ids
+        ]),
+    )
@@ -0,0 +1,378 @@
+import datetime
+import json
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from . import media, search, timeline
+from .models import Comment, Follow, Group, Post, User
+
+GROUP = 'group'
+POST = 'post'
+COMMENT = 'comment'
+FOLLOW = 'follow'
+# Порядок выгрузки: каждая запись идёт после тех, на которые ссылается.
+KINDS = (GROUP, POST, COMMENT, FOLLOW)
+MODELS = {GROUP: Group, POST: Post, COMMENT: Comment, FOLLOW: Follow}
+
+EXPORTED_FIELDS = {
+    GROUP: ('id', 'title', 'slug', 'description'),
+    POST: (
+        'id', 'text', 'pub_date', 'updated', 'author__username',
+        'group_id', 'image',
+    ),
+    COMMENT: ('id', 'post_id', 'author__username', 'text', 'created'),
+    FOLLOW: ('user__username', 'author__username'),
+}
+# Ключи в файле: пользователи - по имени, остальное - по id.
+KEYS = {
+    'author__username': 'author',
+    'user__username': 'user',
+    'group_id': 'group',
+    'post_id': 'post',
+}
+
+
+class Encoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder, который не обрезает время до миллисекунд."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def dumps(kind, row):
+    return json.dumps(
+        {'type': kind, **{KEYS.get(key, key): row[key] for key in row}},
+        cls=Encoder,
+        ensure_ascii=False,
+    )
+
+
+def export_lines(chunk_size):
+    """Строки JSONL со всеми группами, постами, комментариями и подписками.
+
+    Записи читаются курсором порциями по chunk_size, поэтому память
+    не зависит от размера таблиц.
+    """
+    for kind in KINDS:
+        rows = MODELS[kind].objects.order_by('pk').values(
+            *EXPORTED_FIELDS[kind]
+        )
+        for row in rows.iterator(chunk_size=chunk_size):
+            yield dumps(kind, row)
+
+
+def exported_images(chunk_size):
+    return Post.objects.exclude(image='').order_by('image').values_list(
+        'image', flat=True
+    ).distinct().iterator(chunk_size=chunk_size)
+
+
+def copy_media(names, source, target):
+    """Копирует файлы names из хранилища source в хранилище target."""
+    for name in names:
+        if not name or target.exists(name) or not source.exists(name):
+            continue
+        with source.open(name) as content:
+            if hasattr(target, 'replace'):
+                # Имя в хешированном хранилище не пересчитывается.
+                target.replace(name, content)
+            else:
+                target.save(name, content)
+
+
+def insert_as_is(model, objects):
+    """bulk_create с ignore_conflicts, который пишет значения полей как есть.
+
+    Вставка идёт в режиме raw, как у loaddata: pre_save не вызывается,
+    и auto_now/auto_now_add не подменяют даты из файла текущим
+    временем. Сами поля модели не меняются, поэтому посты, которые
+    тем временем сохраняют другие потоки, получают даты как обычно.
+    """
+    if not objects:
+        return
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not (field.primary_key and objects[0].pk is None)
+    ]
+    batch_size = max(connection.ops.bulk_batch_size(fields, objects), 1)
+    for start in range(0, len(objects), batch_size):
+        model._base_manager._insert(
+            objects[start:start + batch_size],
+            fields=fields,
+            raw=True,
+            ignore_conflicts=True,
+        )
+
+
+def insert_with_new_id(model, item):
+    """Вставляет запись как есть, но с id, который выдаст база."""
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not field.primary_key
+    ]
+    item.pk = model._base_manager._insert(
+        [item], fields=fields, return_id=True, raw=True
+    )
+
+
+def user_ids(usernames):
+    """id пользователей по именам; недостающие заводятся без пароля."""
+    found = dict(
+        User.objects.filter(username__in=usernames).values_list(
+            'username', 'id'
+        )
+    )
+    missing = set(usernames) - found.keys()
+    if missing:
+        User.objects.bulk_create(
+            [
+                User(username=username, password=make_password(None))
+                for username in missing
+            ],
+            ignore_conflicts=True,
+        )
+        found.update(
+            User.objects.filter(username__in=missing).values_list(
+                'username', 'id'
+            )
+        )
+    return found
+
+
+def build_posts(rows):
+    users = user_ids({row['author'] for row in rows})
+    return [
+        Post(
+            id=row['id'],
+            text=row['text'],
+            pub_date=parse_datetime(row['pub_date']),
+            updated=parse_datetime(row['updated']),
+            author_id=users[row['author']],
+            group_id=row['group'],
+            image=row['image'] or '',
+        )
+        for row in rows
+    ]
+
+
+def build_comments(rows):
+    users = user_ids({row['author'] for row in rows})
+    return [
+        Comment(
+            id=row['id'],
+            post_id=row['post'],
+            author_id=users[row['author']],
+            text=row['text'],
+            created=parse_datetime(row['created']),
+        )
+        for row in rows
+    ]
+
+
+def build_follows(rows):
+    users = user_ids(
+        {row['user'] for row in rows} | {row['author'] for row in rows}
+    )
+    return [
+        Follow(user_id=users[row['user']], author_id=users[row['author']])
+        for row in rows
+    ]
+
+
+# Поля, по которым запись из файла узнаётся в базе; первое - с индексом.
+SAME_RECORD = {
+    POST: ('pub_date', 'author_id', 'text'),
+    COMMENT: ('created', 'post_id', 'author_id', 'text'),
+}
+
+BUILDERS = {
+    POST: build_posts,
+    COMMENT: build_comments,
+    FOLLOW: build_follows,
+}
+
+
+def stored_texts(model, objects):
+    return model.objects.filter(
+        pk__in=[item.pk for item in objects]
+    ).only('id', 'text')
+
+
+def save_groups(rows, group_ids):
+    """Вставляет группы, сопоставляя их с уже существующими по slug.
+
+    Группа с занятым slug не вставляется, её посты попадут в группу
+    из базы; группа, чей id занят другой группой, получает новый id.
+    В group_ids записывается {id в файле: id в базе}.
+    """
+    slugs = [row['slug'] for row in rows]
+    existing = set(
+        Group.objects.filter(slug__in=slugs).values_list('slug', flat=True)
+    )
+    taken = set(Group.objects.filter(
+        pk__in=[row['id'] for row in rows]
+    ).values_list('pk', flat=True))
+    Group.objects.bulk_create(
+        [
+            Group(**{**row, 'id': None if row['id'] in taken else row['id']})
+            for row in rows
+            if row['slug'] not in existing
+        ],
+        ignore_conflicts=True,
+    )
+    stored = dict(
+        Group.objects.filter(slug__in=slugs).values_list('slug', 'id')
+    )
+    group_ids.update({row['id']: stored[row['slug']] for row in rows})
+
+
+def stored_ids(model, objects, fields):
+    """{id в файле: id в базе} для записей, которые уже есть в базе.
+
+    Запись узнаётся по значениям fields, а не по id: прерванный импорт
+    мог выдать ей новый id.
+    """
+    def key(item):
+        return tuple(getattr(item, field) for field in fields)
+
+    stored = {
+        tuple(row[1:]): row[0]
+        for row in model.objects.filter(**{
+            f'{fields[0]}__in': {getattr(item, fields[0]) for item in objects}
+        }).values_list('id', *fields)
+    }
+    return {
+        item.pk: stored[key(item)] for item in objects if key(item) in stored
+    }
+
+
+def save_records(model, objects, fields, ids):
+    """Вставляет посты или комментарии, сопоставляя их с записями базы.
+
+    Запись, которая уже есть в базе, не вставляется; запись, чей id
+    занят другой записью, получает новый id. В ids записывается
+    {id в файле: id в базе}, а у объектов id меняется на id в базе.
+    """
+    stored = stored_ids(model, objects, fields)
+    fresh = [item for item in objects if item.pk not in stored]
+    taken = set(model.objects.filter(
+        pk__in=[item.pk for item in fresh]
+    ).values_list('pk', flat=True))
+    insert_as_is(model, [item for item in fresh if item.pk not in taken])
+    for item in objects:
+        file_id = item.pk
+        if file_id in stored:
+            item.pk = stored[file_id]
+        elif file_id in taken:
+            insert_with_new_id(model, item)
+        ids[file_id] = item.pk
+
+
+def remap_references(kind, objects, group_ids, post_ids):
+    """Переводит ссылки на группы и посты из id в файле в id в базе."""
+    for item in objects:
+        if kind == POST:
+            item.group_id = group_ids.get(item.group_id, item.group_id)
+        elif kind == COMMENT:
+            item.post_id = post_ids.get(item.post_id, item.post_id)
+
+
+def save_batch(kind, rows, images=None, group_ids=None, post_ids=None):
+    """Вставляет пачку записей одного типа одной транзакцией.
+
+    Записи, которые уже есть в базе (и повторные подписки),
+    пропускаются, поэтому прерванный импорт можно запустить заново.
+    Группы сопоставляются по slug, посты и комментарии - по содержимому;
+    group_ids и post_ids переводят id из файла в id в базе для записей
+    следующих пачек. Сигналы bulk_create не шлёт, так что индекс поиска
+    и счётчики ссылок на картинки обновляются здесь же, а ленты
+    подписчиков - одним проходом в import_lines. Картинки постов
+    копируются из хранилища images до вставки постов.
+    """
+    if group_ids is None:
+        group_ids = {}
+    if post_ids is None:
+        post_ids = {}
+    if kind == GROUP:
+        with transaction.atomic():
+            save_groups(rows, group_ids)
+        return []
+    objects = BUILDERS[kind](rows)
+    remap_references(kind, objects, group_ids, post_ids)
+    names = {row['image'] for row in rows if row.get('image')}
+    if images is not None:
+        copy_media(names, images, media.storage())
+    with transaction.atomic():
+        if kind in SAME_RECORD:
+            save_records(
+                MODELS[kind], objects, SAME_RECORD[kind],
+                post_ids if kind == POST else {}
+            )
+        else:
+            insert_as_is(MODELS[kind], objects)
+        if kind == POST:
+            search.index_posts(stored_texts(Post, objects))
+            media.recount(names)
+        elif kind == COMMENT:
+            search.index_comments(stored_texts(Comment, objects))
+    return objects
+
+
+def timeline_authors(kind, objects):
+    """Авторы, чьи посты пачка могла добавить в чужие ленты."""
+    if kind in (POST, FOLLOW):
+        return {item.author_id for item in objects}
+    return set()
+
+
+def import_lines(lines, batch_size, images=None):
+    """Загружает строки JSONL пачками по batch_size записей одного типа.
+
+    Когда всё загружено, посты новых подписок и новые посты
+    раскладываются по лентам множествами, как в seed_yatube: сначала
+    популярные по таблице подписок авторы переводятся в чтение на
+    лету, затем ленты остальных заполняются INSERT ... SELECT.
+    Возвращает {тип: число прочитанных записей}.
+    """
+    counts = dict.fromkeys(KINDS, 0)
+    authors, group_ids, post_ids = set(), {}, {}
+    kind, batch = None, []
+    for line in lines:
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        row_kind = row.pop('type')
+        if row_kind not in MODELS:
+            raise ValueError(f'Неизвестный тип записи: {row_kind}')
+        if batch and (row_kind != kind or len(batch) == batch_size):
+            authors |= timeline_authors(
+                kind, save_batch(kind, batch, images, group_ids, post_ids)
+            )
+            batch = []
+        kind = row_kind
+        batch.append(row)
+        counts[kind] += 1
+    if batch:
+        authors |= timeline_authors(
+            kind, save_batch(kind, batch, images, group_ids, post_ids)
+        )
+    reset_sequences()
+    timeline.pull_popular()
+    timeline.fill(authors)
+    return counts
+
+
+def reset_sequences():
+    """Сдвигает счётчики id за вставленные явно id (нужно PostgreSQL)."""
+    statements = connection.ops.sequence_reset_sql(
+        no_style(), list(MODELS.values())
+    )
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
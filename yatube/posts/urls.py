@@ -26,6 +26,9 @@ urlpatterns = [
     path('posts/<int:post_id>/comment',
          views.add_comment,
          name='add_comment'),
+    path('search/',
+         views.search_posts,
+         name='search'),
     path('follow/',
          views.follow_index,
          name='follow_index'),
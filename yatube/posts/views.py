@@ -2,32 +2,56 @@ from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
 
+from core.decorators import query_budget
+from core.page_cache import cache_anonymous_page
+
+from . import search, stats, timeline
+from .cache import (
+    feed_generation,
+    group_scopes,
+    index_scopes,
+    post_scopes,
+    profile_scopes,
+)
 from .forms import PostForm, CommentForm
 from .models import Post, Group, Follow
+from .pagination import CursorPaginator
 
 
-def get_page(request, posts):
-    paginator = Paginator(posts, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+def get_page(request, posts, cursor_paginator=None):
+    if 'page' in request.GET:
+        paginator = Paginator(posts, settings.POSTS_PER_PAGE)
+        return paginator.get_page(request.GET.get('page'))
+    if cursor_paginator is None:
+        cursor_paginator = CursorPaginator(posts, settings.POSTS_PER_PAGE)
+    return cursor_paginator.get_page(request.GET.get('cursor'))
 
 
+@query_budget(3)
+@cache_anonymous_page(index_scopes)
 def index(request):
     return render(request, 'posts/index.html', {
-        'page_obj': get_page(request, Post.objects.all()),
+        'page_obj': get_page(request, Post.objects.for_cards()),
+        'feed_generation': feed_generation(),
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
     })
 
 
+@query_budget(4)
+@cache_anonymous_page(group_scopes)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     return render(request, 'posts/group_list.html', {
         'group': group,
-        'page_obj': get_page(request, group.posts.all()),
+        'page_obj': get_page(request, group.posts.for_cards()),
     })
 
 
+@query_budget(6)
+@cache_anonymous_page(profile_scopes)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
     following = (
@@ -40,19 +64,28 @@ def profile(request, username):
     )
     return render(request, 'posts/profile.html', {
         'author': author,
-        'page_obj': get_page(request, author.posts.all()),
+        'stats': stats.get_stats(author.id),
+        'page_obj': get_page(request, author.posts.for_cards()),
         'following': following,
     })
 
 
+@query_budget(4)
+@cache_anonymous_page(post_scopes)
 def post_detail(request, post_id):
+    post = get_object_or_404(Post.objects.for_cards(), id=post_id)
     return render(request, 'posts/post_detail.html', {
-        'post': get_object_or_404(Post, id=post_id),
+        'post': post,
+        'comments': post.comments.select_related('author').order_by(
+            'created'
+        ),
         'form': CommentForm(request.POST or None),
     })
 
 
+@query_budget(12)
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
@@ -65,6 +98,7 @@ def post_create(request):
     })
 
 
+@query_budget(8)
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
@@ -85,6 +119,7 @@ def post_edit(request, post_id):
     })
 
 
+@query_budget(7)
 @login_required
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
@@ -97,33 +132,52 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@query_budget(5)
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    paginator = Paginator(
+        search.SearchResults(query),
+        settings.POSTS_PER_PAGE
+    )
+    return render(request, 'posts/search.html', {
+        'query': query,
+        'page_obj': paginator.get_page(request.GET.get('page')),
+    })
+
+
+@query_budget(6)
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
+    posts, paginator = timeline.follow_feed(
+        request.user,
+        settings.POSTS_PER_PAGE
+    )
     context = {
-        'page_obj': get_page(request, posts)
+        'page_obj': get_page(request, posts, paginator)
     }
     return render(request, 'posts/follow.html', context)
 
 
+@query_budget(16)
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     follower = request.user
     following = get_object_or_404(User, username=username)
-    if follower != following and not (
-        Follow.objects.filter(user=follower, author=following).exists()
-    ):
-        Follow.objects.create(
+    if follower != following:
+        Follow.objects.get_or_create(
             user=follower,
             author=following
         )
     return redirect('posts:profile', username)
 
 
+@query_budget(10)
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     get_object_or_404(
-        Follow,
+        Follow.objects.select_related('user', 'author'),
         user=request.user,
         author__username=username
     ).delete()
@@ -0,0 +1,15 @@
+'use strict';
+{
+    const $ = django.jQuery;
+
+    // Выбор в фильтре сразу применяется, как клик по варианту списка.
+    $(document).on('change', '.autocomplete-filter select', function() {
+        let url = $(this).closest('.autocomplete-filter').data('clearUrl');
+        if (this.value) {
+            url += (url.length > 1 ? '&' : '')
+                + encodeURIComponent(this.name) + '='
+                + encodeURIComponent(this.value);
+        }
+        window.location = url;
+    });
+}
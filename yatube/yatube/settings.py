@@ -47,6 +47,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -146,12 +147,82 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POSTS_PER_PAGE = 10
 
-# Cache backend
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+# Authors with at least this many followers are not fanned out into
+# follower timelines; their posts are merged into the feed at read time.
+TIMELINE_PULL_THRESHOLD = 10000
+
+# Feed fragments are invalidated by a generation counter bumped on every
+# Post/Group change (see posts.cache), so they can live long.
+FEED_CACHE_TIMEOUT = 60 * 60
+
+# Whole pages served to anonymous readers; keys include the time of the
+# last change of the data they show (see core.page_cache).
+ANONYMOUS_PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Rendered post cards are keyed by post id and modification time.
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Thumbnail sizes of post images. They are generated in a background
+# pool right after a post is saved (see posts.thumbnails), so pages
+# only look up existing files.
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
 }
+# Every size is also rendered at these widths (WebP when Pillow supports
+# it, plus JPEG) for srcset.
+POST_THUMBNAIL_WIDTHS = (480, 720, 960)
+# Size of that pool; 0 processes images inline right after commit, which
+# keeps the development server deterministic.
+THUMBNAIL_WORKERS = 0 if DEBUG else 2
+
+# Uploaded originals are downscaled to this size, EXIF-stripped and
+# re-encoded by the same background pool before thumbnails are made.
+POST_IMAGE_MAX_SIZE = 2048
+POST_IMAGE_QUALITY = 85
+
+# Admin bulk actions (see posts.bulk) update and delete rows in batches
+# of this size. Bigger selections than the threshold run in a background
+# pool; 0 workers run them inline right after commit.
+BULK_ACTION_BATCH_SIZE = 500
+BULK_ACTION_BACKGROUND_THRESHOLD = 2000
+BULK_ACTION_WORKERS = 0 if DEBUG else 1
+
+# Cache backend: in production all workers share one SQLite file
+# (see core.cache_backends), so invalidation reaches every process.
+# Hot keys are also kept in a per-process L1 that learns about writes
+# from other workers within INVALIDATION_INTERVAL seconds.
+if DEBUG:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.TieredCache',
+            'OPTIONS': {
+                'SHARED': 'shared',
+                'L1_MAX_ENTRIES': 1000,
+                'L1_TIMEOUT': 60,
+                'INVALIDATION_INTERVAL': 1,
+            },
+        },
+        'shared': {
+            'BACKEND': 'core.cache_backends.SQLiteCache',
+            'LOCATION': os.path.join(BASE_DIR, 'cache', 'cache.sqlite3'),
+            'OPTIONS': {
+                'MAX_ENTRIES': 100000,
+                'CULL_FREQUENCY': 10,
+                'CULL_EVERY': 100,
+                'TOUCH_INTERVAL': 60,
+            },
+        }
+    }
+
+# Per-view SQL query budgets (see core.decorators.query_budget):
+# 'raise' in tests and staging, 'log' in development, None in production.
+QUERY_BUDGET_MODE = 'log' if DEBUG else None
 
 # 403 failure view
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'